@@ -0,0 +1,118 @@
+import os
+import threading
+import time
+
+import numpy as np
+
+import ProjectFile
+
+''' Autosave
+
+    Description:
+        This file contains the periodic saving of the network edited in the GUI to a project file next to the
+        file it was loaded from (BN.autosave.bnp in the working folder if it was never saved). The model is
+        observed to know whether the network changed and which CPTs changed since the last autosave. When an
+        autosave is due, the calling thread takes a snapshot: the description of the variables, the positions, and
+        the changed CPTs converted to arrays. The worker thread never touches the network, whose variables are
+        freed when nodes are deleted or another network is opened. The worker reuses the arrays of the previous
+        autosave for the unchanged CPTs and writes the file to a temporary file renamed over the previous autosave
+        once it is on the disk, so the autosave on the disk is always complete.
+
+'''
+
+AUTOSAVE_INTERVAL = 30  # seconds between two autosaves of a changed network
+AUTOSAVE_SUFFIX = ".autosave" + ProjectFile.PROJECT_EXTENSION
+
+
+class Autosave:
+    def __init__(self, model, interval=AUTOSAVE_INTERVAL):
+        self.model = model
+        self.interval = interval
+        self.dirty = False  # the network changed since the last autosave
+        self.variables = None  # description of the variables, None when the structure changed
+        self.dirtyCPTs = set()  # names of the nodes whose CPT changed since the last autosave
+        self.arrays = {}  # node name -> (parents, CPT array) written by the last autosave
+        self.generation = 0  # incremented when a new network is loaded, the arrays of the previous one are dropped
+        self.lastSave = time.monotonic()
+        self.worker = None  # thread writing the autosave
+        self.result = None  # (generation, arrays written or None if the write failed, message) set by the worker
+        model.addObserver(lambda event, nodeName: self.modelChanged(event, nodeName))
+
+    def path(self):
+        if self.model.path and self.model.path.endswith(AUTOSAVE_SUFFIX):  # An autosave opened to recover it
+            return self.model.path
+        if self.model.path:
+            return os.path.splitext(self.model.path)[0] + AUTOSAVE_SUFFIX
+        return os.path.abspath("BN" + AUTOSAVE_SUFFIX)
+
+    def modelChanged(self, event, nodeName):
+        if event == 'evidence':  # The evidence is not saved
+            return
+        self.dirty = True
+        if event == 'network':
+            self.generation += 1
+            self.variables = None
+            self.arrays = {}
+            self.dirtyCPTs = set()
+        elif event == 'structure':
+            self.variables = None  # the CPTs whose axes changed are found when the variables are described again
+        elif event == 'potential':
+            self.dirtyCPTs.add(nodeName)
+
+    def poll(self):
+        # called regularly by the GUI: start an autosave if one is due, return the message of a finished one
+        message = None
+        if self.worker is not None and not self.worker.is_alive():
+            self.worker = None
+            generation, arrays, message = self.result
+            if arrays is None:
+                self.dirty = True  # Tried again at the next interval
+            if generation == self.generation:
+                self.arrays = arrays or {}  # After a failure, the CPTs are all read again by the next autosave
+        if self.worker is None and self.dirty and time.monotonic() - self.lastSave >= self.interval:
+            self.start()
+        return message
+
+    def start(self):
+        # take the snapshot of the network and write it in a worker thread
+        model = self.model
+        if self.path() == model.path:
+            # an autosave opened to recover it, the CPTs mapped from it are copied before it is replaced
+            model.loadCPTs()
+        if self.variables is None:
+            self.variables = ProjectFile.describeNetwork(model.bn, model.positions)
+        else:  # Only the positions changed since the last description
+            for description in self.variables:
+                position = model.positions.get(description["name"])
+                description["position"] = list(position) if position is not None else None
+        arrays = {}
+        for description in self.variables:
+            name = description["name"]
+            cached = self.arrays.get(name)
+            if name in model.storedCPTs:  # Not yet copied into the network, the mapped array is unchanged
+                arrays[name] = model.storedCPTs[name]
+            elif (name in self.dirtyCPTs or cached is None or cached[0] != description["parents"]
+                  or list(cached[1].shape) != description["shape"]):
+                arrays[name] = model.bn.cpt(name).toarray()
+            else:
+                arrays[name] = cached[1]
+        variables = [dict(description) for description in self.variables]  # The worker gets its own copy
+        self.dirty = False
+        self.dirtyCPTs = set()
+        self.lastSave = time.monotonic()
+        self.result = (self.generation, None, "Autosave failed")  # Replaced by the worker unless it stops early
+        self.worker = threading.Thread(target=self.write, args=(self.path(), variables, arrays, self.generation),
+                                       daemon=True)  # Closing never waits, the previous autosave stays intact
+        self.worker.start()
+
+    def write(self, path, variables, arrays, generation):
+        # run by the worker thread with numpy arrays and plain descriptions only, the result is taken by poll
+        try:
+            ProjectFile.writeProjectFile(path, variables, arrays)
+        except OSError as e:
+            self.result = (generation, None, "Autosave failed: " + str(e))
+            return
+        # the arrays mapped from a project file are not kept, so the file can be replaced once they are copied
+        arrays = {description["name"]: (description["parents"], arrays[description["name"]])
+                  for description in variables if not isinstance(arrays[description["name"]], np.memmap)}
+        self.result = (generation, arrays, "Autosaved to " + path)
@@ -0,0 +1,421 @@
+import os
+import time
+
+import numpy as np
+import pyAgrum as gum
+
+import GraphLayout
+import InferenceCost
+import ProjectFile
+from InferenceServer import (AUTO_ENGINE, DEFAULT_STOPPING, InferenceCache, InferenceClient, PosteriorStore, accuracy,
+                             isApproximate, restoreBN, snapshotBN)
+from PosteriorCache import PosteriorCache
+
+''' Bayesian Model
+
+    Description:
+        This file contains the model of the Bayesian network edited by the GUI: the network itself, the positions
+        of its nodes, the evidence, the editing of the CPTs, the inference and the input and output of the
+        BIF/_LOC.txt files and of the project files.
+        It does not depend on PyQt, so the network can be scripted or used by batch jobs without a display. The
+        GUI registers an observer to be told about every change.
+
+'''
+
+
+def readNetwork(path):
+    # network of a BIF or project file, the positions of its nodes and the memory-mapped CPTs of a project file;
+    # raise gum.IOError or gum.FatalError for a BIF file, FileNotFoundError or ValueError for a project file. No
+    # model is changed, so a large file can be read in a worker thread
+    if ProjectFile.isProject(path):
+        return ProjectFile.readProject(path)
+    bn = gum.loadBN(path)
+    positions = {}
+    names = set(bn.names())
+    try:
+        with open(path.replace(".bif", "_LOC.txt"), "r") as loc:
+            for line in loc:
+                name, x, y = line.split()
+                if name in names:
+                    positions[name] = (float(x), float(y))
+    except FileNotFoundError:  # Nodes without position are laid out
+        pass
+    return bn, positions, {}
+
+
+class CPTTable:
+    # values of a potential as an array with one axis per variable, labelled with the names and the labels of the
+    # variables; the axes follow toarray, the reverse of names, so the child of a CPT is on the last axis
+    def __init__(self, potential):
+        variables = [potential.variable(i) for i in reversed(range(potential.nbrDim()))]
+        self.potential = potential
+        self.names = [variable.name() for variable in variables]
+        self.labels = [[variable.label(i) for i in range(variable.domainSize())] for variable in variables]
+        self.shape = tuple(len(labels) for labels in self.labels)
+        self.values = None  # read from the potential on the first call of array()
+
+    def array(self):
+        if self.values is None:
+            self.values = self.potential.toarray()
+        return self.values
+
+    def setArray(self, values):
+        # values just written to the potential, so they do not have to be read back
+        self.values = np.reshape(values, self.shape)
+
+    def rows(self, rows=None):
+        # one row per configuration of the parents, in the order of loopIn(); when only some rows are asked and the
+        # array was never read, they are extracted one by one so the cost does not depend on the size of the CPT
+        if self.values is None and rows is not None:
+            values = np.empty((len(rows), self.shape[-1]))
+            for i, row in enumerate(rows):
+                parents = np.unravel_index(row, self.shape[:-1])
+                instantiation = {name: int(state) for name, state in zip(self.names, parents)}
+                values[i] = self.potential.extract(instantiation).toarray()
+            return values
+        values = self.array().reshape(-1, self.shape[-1])
+        return values if rows is None else values[rows]
+
+
+class BayesianModel:
+    def __init__(self):
+        self.bn = gum.BayesNet('Bayesian Net')
+        self.positions = {}  # node name -> (x, y) of the top left corner of the node in the scene
+        self.evidence = {}  # node name -> index of the observed state (hard) or likelihood list (soft)
+        self.version = 0  # incremented by every change of the network or of the evidence
+        self.networkVersion = 0  # incremented by every change of the structure or of the CPTs
+        self.observers = []  # functions called with (event, node name) after every change
+        # node name -> memory-mapped CPT of a project file, copied into self.bn when the CPT is first used
+        self.storedCPTs = {}
+        self.path = None  # file the network was loaded from or last saved to
+        self.stopping = dict(DEFAULT_STOPPING)  # stopping criteria of the approximate inference engines
+
+        self.inferenceClient = InferenceClient()  # process running the inference on a snapshot of self.bn
+        self.networkOutdated = True  # the structure changed since the last snapshot sent to the inference process
+        self.dirtyPotentials = set()  # names of the nodes whose CPT changed since the last snapshot
+        self.localInference = None  # InferenceCache used by the synchronous queries
+        self.posteriorCache = PosteriorCache()  # results of the queries, for the current networkVersion only
+        self.pendingKey = None  # cache key of the query sent to the inference process
+        self.cachedReply = None  # result found in the cache, returned by the next pollInference
+        self.cost = InferenceCost.CostEstimator(self)  # size of the junction tree, for the "Auto" inference mode
+
+    def addObserver(self, observer):
+        self.observers.append(observer)
+
+    def notify(self, event, nodeName=None):
+        # event is 'network', 'structure', 'potential', 'evidence' or 'position'
+        if event != 'position':
+            self.version += 1
+        if event in ('network', 'structure', 'potential'):
+            # the cached posteriors were computed on the previous network, none of them can be used again
+            self.networkVersion += 1
+            self.posteriorCache.clear()
+        if event in ('network', 'structure'):
+            # the engines cached by the inference process no longer match self.bn
+            self.networkOutdated = True
+            self.dirtyPotentials = set()
+            self.localInference = None
+        elif event == 'potential':
+            # the structure is unchanged, only the potential of the node must be reloaded
+            if not self.networkOutdated:
+                self.dirtyPotentials.add(nodeName)
+            if self.localInference is not None:
+                self.localInference.updatePotential(nodeName, self.bn.cpt(nodeName).toarray())
+        for observer in self.observers:
+            observer(event, nodeName)
+
+    def names(self):
+        return [self.bn.variable(node).name() for node in self.bn.nodes()]
+
+    def hasNode(self, nodeName):
+        try:
+            self.bn.idFromName(nodeName)
+        except gum.NotFound:
+            return False
+        return True
+
+    def checkName(self, nodeName):
+        if self.hasNode(nodeName):
+            raise ValueError('Node already present')
+        if not 10 > len(str(nodeName)) > 0:
+            raise ValueError('Node name must consist of between 1 and 10 characters')
+
+    def checkNode(self, nodeName):
+        if not self.hasNode(nodeName):
+            raise ValueError('"' + str(nodeName) + '" is not in network')
+
+    def addNode(self, nodeName, x, y, bounds=None):
+        # bounds is None for a LabelizedVariable, (minimum, maximum) for a RangeVariable
+        self.checkName(nodeName)
+        if bounds is not None:
+            var = gum.RangeVariable(nodeName, "", bounds[0], bounds[1])
+            potential = []
+            for i in range(var.domainSize()):
+                potential.append(0.5)
+        else:
+            var = gum.LabelizedVariable(nodeName, "", 2)
+            potential = [0.5, 0.5]
+        self.bn.add(var)
+        self.bn.cpt(nodeName).fillWith(potential)
+        self.positions[nodeName] = (x, y)
+        self.notify('structure', nodeName)
+
+    def removeNode(self, nodeName):
+        # return the arcs that were removed with the node
+        if not self.hasNode(nodeName):
+            raise ValueError(str(nodeName) + ' is not in graph')
+        children = self.children(nodeName)
+        connections = [(parent, nodeName) for parent in self.parents(nodeName)]
+        connections += [(nodeName, child) for child in children]
+        for child in children:
+            self.loadCPT(child)  # Before the node is removed from its axes
+        self.storedCPTs.pop(nodeName, None)
+        self.bn.erase(nodeName)
+        self.positions.pop(nodeName, None)
+        self.evidence.pop(nodeName, None)
+        self.notify('structure', nodeName)
+        return connections
+
+    def moveNode(self, nodeName, x, y):
+        self.positions[nodeName] = (x, y)
+        self.notify('position', nodeName)
+
+    def parents(self, nodeName):
+        return [self.bn.variable(parent).name() for parent in self.bn.parents(nodeName)]
+
+    def children(self, nodeName):
+        return [self.bn.variable(child).name() for child in self.bn.children(nodeName)]
+
+    def arcs(self):
+        names = {node: self.bn.variable(node).name() for node in self.bn.nodes()}  # One lookup per node, not per arc
+        return [(names[tail], names[head]) for tail, head in self.bn.arcs()]
+
+    def hasArc(self, tail, head):
+        return self.bn.existsArc(tail, head)
+
+    def addArc(self, tail, head):
+        self.checkNode(tail)
+        self.checkNode(head)
+        if tail == head:  # ensure node values are unique
+            raise ValueError('Two unique node values required to create an arc')
+        if self.hasArc(tail, head) or self.hasArc(head, tail):
+            raise ValueError('Arc already present between the two nodes')
+        self.loadCPT(head)  # Before the tail is added to its axes
+        try:
+            self.bn.addArc(tail, head)
+        except gum.InvalidDirectedCycle:
+            raise ValueError('The arc from ' + str(tail) + ' to ' + str(head) + ' would create a cycle')
+        self.notify('structure', head)
+
+    def removeArc(self, tail, head):
+        self.checkNode(tail)
+        self.checkNode(head)
+        if not self.hasArc(tail, head):
+            raise ValueError('No edge exists between nodes ' + str(tail) + ' and ' + str(head))
+        self.loadCPT(head)
+        self.bn.eraseArc(tail, head)
+        self.notify('structure', head)
+
+    def loadCPT(self, nodeName):
+        # copy the memory-mapped CPT of the node into the network the first time it is used, return its values
+        values = self.storedCPTs.pop(nodeName, None)
+        if values is not None:
+            self.bn.cpt(nodeName).fillWith(values.ravel().tolist())
+        return values
+
+    def loadCPTs(self):
+        for name in list(self.storedCPTs):
+            self.loadCPT(name)
+
+    def cpt(self, nodeName):
+        self.loadCPT(nodeName)
+        return self.bn.cpt(nodeName)
+
+    def cptTable(self, nodeName):
+        values = self.loadCPT(nodeName)
+        table = CPTTable(self.bn.cpt(nodeName))
+        if values is not None:  # Already in memory, the potential does not have to be read back
+            table.setArray(np.array(values))
+        return table
+
+    def setCPT(self, nodeName, values):
+        # values are given in the order of loopIn(), the state of the child changes first; written in one operation
+        self.storedCPTs.pop(nodeName, None)
+        self.bn.cpt(nodeName).fillWith(np.asarray(values, dtype=float).ravel().tolist())
+        self.notify('potential', nodeName)
+
+    def setEvidence(self, nodeName, evidence):
+        # evidence is the index of the observed state, a list of likelihoods or None to erase it
+        self.checkNode(nodeName)
+        if evidence is None:
+            self.evidence.pop(nodeName, None)
+        else:
+            self.evidence[nodeName] = evidence
+        self.notify('evidence', nodeName)
+
+    def submitInference(self, *request):
+        # send a request to the inference process together with what changed since the last request
+        if self.networkOutdated or not self.inferenceClient.isStarted():
+            self.loadCPTs()
+            self.inferenceClient.send('network', snapshotBN(self.bn))
+            self.networkOutdated = False
+            self.dirtyPotentials = set()
+        for name in self.dirtyPotentials:
+            self.inferenceClient.send('potential', name, self.bn.cpt(name).toarray())
+        self.dirtyPotentials = set()
+        self.inferenceClient.send(*request)
+
+    def chooseEngine(self, index):
+        # engine of an inference mode: "Auto" is an exact engine if the junction tree fits in memory, an
+        # approximate one otherwise or while the size of the junction tree of a large network is being estimated
+        if index != AUTO_ENGINE:
+            return index
+        return InferenceCost.chooseEngine(self.cost.current())
+
+    def cacheKey(self, nodeName, index):
+        # key of the result of a query in the posterior cache, nodeName is None for the posteriors of all the
+        # nodes; the stopping criteria change the result of an approximate engine only
+        evidence = tuple(sorted((name, tuple(value) if isinstance(value, list) else value)
+                                for name, value in self.evidence.items()))
+        stopping = tuple(sorted(self.stopping.items())) if isApproximate(index) else None
+        return self.networkVersion, evidence, index, stopping, nodeName
+
+    def requestPosterior(self, nodeName, index):
+        # return True if the result was found in the cache, it is then returned by the next pollInference
+        index = self.chooseEngine(index)
+        return self.requestResult(self.cacheKey(nodeName, index), 'posterior', index, nodeName, dict(self.evidence),
+                                  dict(self.stopping))
+
+    def requestPosteriors(self, index):
+        index = self.chooseEngine(index)
+        return self.requestResult(self.cacheKey(None, index), 'posteriors', index, dict(self.evidence),
+                                  dict(self.stopping))
+
+    def requestResult(self, key, *request):
+        self.cachedReply = self.posteriorCache.get(key)
+        if self.cachedReply is not None:
+            return True
+        self.pendingKey = key
+        self.submitInference(*request)
+        return False
+
+    def pollInference(self):
+        # reply of the inference process, None while it is still running
+        if self.cachedReply is not None:
+            reply, self.cachedReply = self.cachedReply, None
+            return reply
+        reply = self.inferenceClient.poll()
+        if reply is None:
+            return None
+        if reply[0] == 'error' and not self.inferenceClient.isStarted():
+            self.networkOutdated = True  # The snapshot died with the process
+        elif reply[0] != 'error' and self.pendingKey[0] == self.networkVersion:  # Not edited while it ran
+            self.posteriorCache.put(self.pendingKey, reply)
+        self.pendingKey = None
+        return reply
+
+    def cancelInference(self):
+        self.inferenceClient.stop()  # the snapshot is lost with the process, send it again next time
+        self.networkOutdated = True
+        self.pendingKey = None
+        self.cachedReply = None
+
+    def getLocalEngine(self, index, target=None):
+        # synchronous inference in this process, for scripts that do not need to keep a GUI responsive; with a
+        # target, the engine runs on the network pruned to what the posterior of the target depends on
+        if self.localInference is None:
+            self.loadCPTs()
+            self.localInference = InferenceCache(restoreBN(snapshotBN(self.bn)))
+        self.localInference.evidence = dict(self.evidence)
+        cache = self.localInference if target is None else self.localInference.prunedCache(target)
+        ie = cache.getEngine(self.chooseEngine(index), self.stopping)
+        ie.makeInference()
+        return ie
+
+    def posterior(self, nodeName, index=0):
+        # read-only array, shared with the posterior cache
+        index = self.chooseEngine(index)
+        key = self.cacheKey(nodeName, index)
+        reply = self.posteriorCache.get(key)
+        if reply is None:
+            start = time.perf_counter()
+            ie = self.getLocalEngine(index, nodeName)
+            posterior = ie.posterior(nodeName).toarray()
+            pruned = self.localInference.pruned[2].bn
+            reply = ('posterior', nodeName, posterior, time.perf_counter() - start, accuracy(ie),
+                     (pruned.size(), self.bn.size()))
+            self.posteriorCache.put(key, reply)
+        return reply[2]
+
+    def posteriors(self, index=0):
+        # the store is shared with the posterior cache, its values are read-only
+        index = self.chooseEngine(index)
+        key = self.cacheKey(None, index)
+        reply = self.posteriorCache.get(key)
+        if reply is None:
+            start = time.perf_counter()
+            ie = self.getLocalEngine(index)
+            store = PosteriorStore([(name, ie.posterior(name).toarray()) for name in self.names()])
+            reply = ('posteriors', store, time.perf_counter() - start, accuracy(ie))
+            self.posteriorCache.put(key, reply)
+        return reply[1]
+
+    def load(self, path):
+        # load a BIF file and the positions saved next to it or a project file, see readNetwork for the errors
+        self.setNetwork(*readNetwork(path), path=path)
+
+    def setNetwork(self, bn, positions, storedCPTs=None, path=None):
+        # replace the network and the positions of its nodes, the evidence is erased
+        self.bn = bn
+        self.positions = positions
+        self.storedCPTs = dict(storedCPTs or {})
+        self.path = path
+        self.evidence = {}
+        self.notify('network')
+
+    def placeNode(self, nodeName, x, y):
+        # give a position to a node loaded without one
+        self.positions[nodeName] = (x, y)
+        self.notify('position', nodeName)
+
+    def layoutNodes(self, method=None):
+        # give a position to all the nodes loaded without one, laid out by GraphLayout below the placed nodes
+        unplaced = self.unplacedNodes()
+        if not unplaced:
+            return
+        names = set(unplaced)
+        arcs = [(tail, head) for tail, head in self.arcs() if tail in names and head in names]
+        top = max(y for x, y in self.positions.values()) + GraphLayout.SPACING[1] if self.positions else 0
+        for name, (x, y) in GraphLayout.layout(unplaced, arcs, method).items():
+            self.positions[name] = (x, y + top)
+        self.notify('position')
+
+    def unplacedNodes(self):
+        return [name for name in self.names() if name not in self.positions]
+
+    def save(self, path):
+        # project file if path ends with ProjectFile.PROJECT_EXTENSION, BIF and _LOC.txt files otherwise. Every
+        # file is written next to its path and then renamed, so a failed save leaves the previous files intact.
+        if ProjectFile.isProject(path):
+            if self.path is not None and os.path.abspath(path) == os.path.abspath(self.path):
+                # the CPTs are still mapped from the file being replaced, which Windows refuses to replace
+                self.loadCPTs()
+            ProjectFile.writeProject(path, self.bn, self.positions, self.storedCPTs)
+        else:
+            self.loadCPTs()
+            self.bn.saveBIF(path + ".tmp")
+            os.replace(path + ".tmp", path)
+            self.saveNodesLocation(path)
+        self.path = path
+
+    def saveNodesLocation(self, path):
+        locationPath = path.replace('.bif', '_LOC.txt')
+        with open(locationPath + ".tmp", "w") as file:
+            for name, (x, y) in self.positions.items():
+                file.write(name)
+                file.write(" ")
+                file.write(str(x))
+                file.write(" ")
+                file.write(str(y))
+                file.write("\n")
+        os.replace(locationPath + ".tmp", locationPath)
@@ -0,0 +1,77 @@
+import ast
+import functools
+
+import numpy as np
+
+''' CPT Expression
+
+    Description:
+        This file contains the compilation of the custom functions used to fill the CPT of a RangeVariable. A
+        function is a Python expression of x, the states of the child, and of the parents of the node, for example
+        norm.pdf(x, loc=a*10). It is checked, compiled once and kept in a cache keyed by its text, then evaluated
+        with NumPy on every row of the CPT at the same time.
+
+'''
+
+# Functions of NumPy that can be called by name in an expression
+NUMPY_NAMES = ["abs", "arccos", "arcsin", "arctan", "cos", "cosh", "exp", "log", "log10", "log2", "maximum",
+               "minimum", "pi", "e", "power", "sin", "sinh", "sqrt", "tan", "tanh", "where", "clip"]
+# Nodes of the syntax tree allowed in an expression: no statements, lambdas, comprehensions or subscripts
+ALLOWED_NODES = (ast.Expression, ast.BinOp, ast.UnaryOp, ast.BoolOp, ast.Compare, ast.IfExp, ast.Call, ast.keyword,
+                 ast.Name, ast.Load, ast.Constant, ast.Attribute, ast.operator, ast.unaryop, ast.boolop, ast.cmpop)
+
+
+def namespace():
+    # names available to every expression, scipy is slow to import so it is loaded with the first expression
+    from scipy import stats
+    names = {name: getattr(np, name) for name in NUMPY_NAMES}
+    names.update({"np": np, "stats": stats, "norm": stats.norm, "maxwell": stats.maxwell})
+    return names
+
+
+@functools.lru_cache(maxsize=64)
+def compileExpression(text, variables):
+    # function of the variables (x and the parents) computing the expression, ValueError if it is not valid
+    if not text.strip():
+        raise ValueError("The expression is empty")
+    try:
+        tree = ast.parse(text.strip(), mode="eval")
+    except SyntaxError as e:
+        raise ValueError("Invalid expression: " + str(e.msg))
+    names = namespace()
+    for node in ast.walk(tree):
+        if not isinstance(node, ALLOWED_NODES):
+            raise ValueError("'" + type(node).__name__ + "' is not allowed in an expression")
+        if isinstance(node, ast.Attribute) and node.attr.startswith("_"):
+            raise ValueError("'" + node.attr + "' is not allowed in an expression")
+        if isinstance(node, ast.Name) and node.id not in variables and node.id not in names:
+            raise ValueError("Unknown name '" + node.id + "', use x and the names of the parents")
+    if "x" in variables and not any(isinstance(node, ast.Name) and node.id == "x" for node in ast.walk(tree)):
+        raise ValueError("The expression must contain the variable x")
+    code = compile(tree, "<expression>", "eval")
+    names["__builtins__"] = {}
+
+    def function(**values):
+        return eval(code, names, values)
+
+    return function
+
+
+def parentValues(labels):
+    # numeric value of every state of a parent: its label if all the labels are numbers, its index otherwise
+    try:
+        return np.array([float(label) for label in labels])
+    except ValueError:
+        return np.arange(len(labels), dtype=float)
+
+
+def evaluateExpression(text, points, parentNames, parentLabels, rows):
+    # values of the expression on the rows of a CPT: points holds the x of every state of the child for each row
+    function = compileExpression(text, tuple(["x"] + list(parentNames)))
+    parents = np.unravel_index(rows, tuple(len(labels) for labels in parentLabels))
+    values = {"x": points}
+    for name, labels, states in zip(parentNames, parentLabels, parents):
+        values[name] = parentValues(labels)[states][:, np.newaxis]  # One value per row, broadcast on the states
+    with np.errstate(all="ignore"):
+        result = function(**values)
+    return np.broadcast_to(np.asarray(result, dtype=float), points.shape)
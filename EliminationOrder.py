@@ -0,0 +1,200 @@
+import collections
+import hashlib
+import heapq
+import itertools
+import json
+import multiprocessing
+import os
+import random
+import sys
+
+''' Elimination Order
+
+    Description:
+        This file contains the search of a good elimination order for the exact inference of
+        JunctionTreeInference. The moral graph of the network is eliminated greedily with several heuristics
+        (min-fill, weighted min-fill, min-degree) and with randomized restarts breaking their ties at random,
+        optionally in a pool of processes. The order whose clusters have the fewest cells in total is kept.
+        The best order and its clusters are stored on the disk, keyed by a hash of the structure of the network
+        (names, domain sizes and arcs), so a network opened again with the same structure reuses them without
+        eliminating anything. Only the most recently used orders are kept. The orders of the networks pruned for a
+        single query change with the query and the evidence, they are only kept in memory so they do not push the
+        order of the whole network out of the disk. The orders of a network can be computed in advance with:
+
+            python EliminationOrder.py network.bif [processes]
+
+'''
+
+CRITERIA = ("weighted-min-fill", "min-fill", "min-degree")
+RESTARTS = 8  # randomized eliminations tried after the deterministic ones
+ORDER_CACHE = os.path.join(os.path.expanduser("~"), ".BayesianEditor", "orders")
+ORDER_CACHE_FILES = 32  # orders kept on the disk, every edit of the arcs gives a new structure
+MEMORY_ORDERS = 64  # orders of pruned networks kept in memory by each process
+
+memoryOrders = collections.OrderedDict()  # structure hash -> elimination, the least recently used first
+
+
+def structureHash(domainSizes, arcs):
+    structure = json.dumps([sorted(domainSizes.items()), sorted(arcs)], separators=(",", ":"))
+    return hashlib.sha256(structure.encode("utf-8")).hexdigest()
+
+
+def moralGraph(domainSizes, arcs):
+    # node name -> set of neighbours, the parents of every node are married
+    graph = {name: set() for name in domainSizes}
+    parents = {name: [] for name in domainSizes}
+    for tail, head in arcs:
+        parents[head].append(tail)
+    for name, family in parents.items():
+        for k, parent in enumerate(family):
+            graph[parent].add(name)
+            graph[name].add(parent)
+            for other in family[k + 1:]:
+                graph[parent].add(other)
+                graph[other].add(parent)
+    return graph
+
+
+def eliminate(graph, domainSizes, criterion, seed=None):
+    # greedy elimination of the graph, the node of lowest score first; seed breaks the ties at random. Return the
+    # clusters in the order of elimination, every cluster is the eliminated node followed by its neighbours.
+    graph = {name: set(neighbours) for name, neighbours in graph.items()}
+    tieBreak = random.Random(seed).random if seed is not None else itertools.count().__next__
+
+    def score(name):
+        neighbours = graph[name]
+        if criterion == "min-degree":
+            return len(neighbours)
+        fill = 0
+        for neighbour in neighbours:
+            missing = neighbours - graph[neighbour]
+            missing.discard(neighbour)
+            if criterion == "min-fill":
+                fill += len(missing)
+            else:
+                fill += domainSizes[neighbour] * sum(domainSizes[other] for other in missing)
+        return fill // 2  # Every missing edge was counted from both ends
+
+    scores = {name: score(name) for name in graph}
+    heap = [(value, tieBreak(), name) for name, value in scores.items()]
+    heapq.heapify(heap)
+    clusters = []
+    while heap:
+        value, tie, name = heapq.heappop(heap)
+        if name not in graph or scores[name] != value:  # Eliminated already, or scored again since
+            continue
+        neighbours = graph.pop(name)
+        clusters.append([name] + sorted(neighbours))
+        for neighbour in neighbours:
+            graph[neighbour].discard(name)
+            graph[neighbour] |= neighbours - {neighbour}  # Fill-in edges: the neighbours become a clique
+        touched = set(neighbours)
+        if criterion != "min-degree":  # The fill of the neighbours of the neighbours changed too
+            for neighbour in neighbours:
+                touched |= graph[neighbour]
+        for other in sorted(touched):  # Sorted, the ties do not depend on the hashes of the names
+            scores[other] = score(other)
+            heapq.heappush(heap, (scores[other], tieBreak(), other))
+    return clusters
+
+
+def clusterCells(domainSizes, clusters):
+    total = 0
+    for cluster in clusters:
+        cells = 1
+        for name in cluster:
+            cells *= domainSizes[name]
+        total += cells
+    return total
+
+
+def optimizeOrder(domainSizes, arcs, restarts=RESTARTS, processes=None):
+    # best elimination found by the heuristics: {"order", "clusters", "treewidth", "cells"}
+    graph = moralGraph(domainSizes, arcs)
+    tasks = [(graph, domainSizes, criterion, None) for criterion in CRITERIA]
+    tasks += [(graph, domainSizes, CRITERIA[i % len(CRITERIA)], i) for i in range(restarts)]
+    if processes and processes > 1:
+        with multiprocessing.get_context('spawn').Pool(processes) as pool:
+            eliminations = pool.starmap(eliminate, tasks)
+    else:
+        eliminations = [eliminate(*task) for task in tasks]
+    clusters = min(eliminations, key=lambda clusters: (clusterCells(domainSizes, clusters),
+                                                       max([len(cluster) for cluster in clusters] or [1])))
+    return {"order": [cluster[0] for cluster in clusters], "clusters": clusters,
+            "treewidth": max([len(cluster) for cluster in clusters] or [1]) - 1,
+            "cells": clusterCells(domainSizes, clusters)}
+
+
+def loadOrder(key):
+    # stored elimination of the structure, None if there is none or it cannot be read
+    path = os.path.join(ORDER_CACHE, key + ".json")
+    try:
+        with open(path, "r") as file:
+            elimination = json.load(file)
+        os.utime(path)  # Used now, it is dropped after the others
+        return elimination
+    except (OSError, ValueError):
+        return None
+
+
+def saveOrder(key, elimination):
+    # written next to its path and renamed, so a process reading the cache never sees a partial file
+    try:
+        os.makedirs(ORDER_CACHE, exist_ok=True)
+        path = os.path.join(ORDER_CACHE, key + ".json")
+        with open(path + ".tmp", "w") as file:
+            json.dump(elimination, file)
+        os.replace(path + ".tmp", path)
+        pruneOrders()
+    except OSError:  # The order is computed again next time
+        pass
+
+
+def pruneOrders(keep=ORDER_CACHE_FILES):
+    # delete all but the keep most recently used orders
+    files = []
+    for entry in os.scandir(ORDER_CACHE):
+        if entry.name.endswith(".json"):
+            try:
+                files.append((entry.stat().st_mtime, entry.path))
+            except OSError:  # Deleted by another process meanwhile
+                pass
+    for mtime, path in sorted(files, reverse=True)[keep:]:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def bestOrder(domainSizes, arcs, processes=None, store=True):
+    # elimination stored for the structure, or optimized and stored; with store False it is kept in memory only
+    key = structureHash(domainSizes, arcs)
+    elimination = loadOrder(key) if store else memoryOrders.get(key)
+    if elimination is None or set(elimination["order"]) != set(domainSizes):
+        elimination = optimizeOrder(domainSizes, arcs, processes=processes)
+        if store:
+            saveOrder(key, elimination)
+    if not store:
+        memoryOrders[key] = elimination
+        memoryOrders.move_to_end(key)
+        while len(memoryOrders) > MEMORY_ORDERS:
+            memoryOrders.popitem(last=False)
+    return elimination
+
+
+def networkStructure(bn):
+    # domain sizes and arcs of a pyAgrum network, by node name
+    domainSizes = {bn.variable(node).name(): bn.variable(node).domainSize() for node in bn.nodes()}
+    arcs = [[bn.variable(tail).name(), bn.variable(head).name()] for tail, head in bn.arcs()]
+    return domainSizes, arcs
+
+
+if __name__ == "__main__":
+    import time
+    import pyAgrum as gum
+
+    start = time.perf_counter()
+    structure = networkStructure(gum.loadBN(sys.argv[1]))
+    result = bestOrder(*structure, processes=int(sys.argv[2]) if len(sys.argv) > 2 else None)
+    print("{} nodes: treewidth {}, {} cells, {:.2f} s".format(len(structure[0]), result["treewidth"],
+                                                               result["cells"], time.perf_counter() - start))
@@ -0,0 +1,189 @@
+import os
+import random
+import sys
+import tempfile
+import time
+
+import pyAgrum as gum
+
+''' Graph Benchmarks
+
+    Description:
+        This file contains benchmarks of the graph scene on synthetic networks, run without a display:
+
+            python GraphBenchmarks.py import 1000 5000 10000
+            python GraphBenchmarks.py repaint 1000 5000
+            python GraphBenchmarks.py layout 1000 5000 10000
+            python GraphBenchmarks.py project 100 500
+
+        "import" times GraphScene.importBN on a BIF file of binary variables saved with a _LOC.txt file, so the
+        time covers loading the network and creating the nodes and the arcs of the scene.
+        "repaint" shows the whole network in a view, then counts the frames per second while a node is dragged
+        with the mouse and while the view is repainted entirely.
+        "layout" times GraphScene.importBN on a BIF file saved without a _LOC.txt file, so the nodes are laid out
+        by GraphLayout, and then each layout method alone.
+        "project" saves a network of variables with 20 states and random CPTs as BIF and as a project file, then
+        times loading each of them into a BayesianModel and reading one CPT.
+
+'''
+
+
+def syntheticNetwork(size, arcsPerNode=2, seed=0, states=2):
+    # DAG of variables with the given number of states: every node gets up to arcsPerNode parents among the nodes
+    # placed close before it
+    rng = random.Random(seed)
+    bn = gum.BayesNet('Synthetic')
+    columns = max(int(size ** 0.5), 1)
+    for i in range(size):
+        bn.add(gum.LabelizedVariable('n' + str(i), "", states))
+    for i in range(1, size):
+        candidates = [j for j in (i - 1, i - 2, i - columns, i - columns - 1) if j >= 0]
+        for j in rng.sample(candidates, min(arcsPerNode, len(candidates))):
+            bn.addArc(j, i)
+    positions = {'n' + str(i): (60 * (i % columns), 60 * (i // columns)) for i in range(size)}
+    return bn, positions
+
+
+def saveNetwork(bn, positions, path):
+    bn.saveBIF(path)
+    with open(path.replace('.bif', '_LOC.txt'), 'w') as loc:
+        for name, (x, y) in positions.items():
+            loc.write("{} {} {}\n".format(name, x, y))
+
+
+def saveSynthetic(size, directory, positions=True):
+    # path of a synthetic network saved in the directory, with a _LOC.txt file if positions is True, and the network
+    bn, nodePositions = syntheticNetwork(size)
+    path = os.path.join(directory, 'synthetic{}.bif'.format(size))
+    if positions:
+        saveNetwork(bn, nodePositions, path)
+    else:
+        bn.saveBIF(path)
+    return path, bn
+
+
+def importScene(size, directory, positions=True):
+    # scene showing a synthetic network saved in the directory, and the network
+    from GraphGuiClasses import GraphScene
+    path, bn = saveSynthetic(size, directory, positions)
+    scene = GraphScene()
+    scene.importBN(path)
+    return scene, bn
+
+
+def benchmarkImport(sizes, positions=True):
+    from PyQt5 import QtWidgets
+    from GraphGuiClasses import GraphScene
+    app = QtWidgets.QApplication.instance() or QtWidgets.QApplication(sys.argv)
+    with tempfile.TemporaryDirectory() as directory:
+        for size in sizes:
+            path, bn = saveSynthetic(size, directory, positions)
+            scene = GraphScene()
+            start = time.perf_counter()
+            scene.importBN(path)
+            app.processEvents()
+            elapsed = time.perf_counter() - start
+            print("import {:>6} nodes {:>6} arcs: {:8.2f} s".format(size, bn.sizeArcs(), elapsed))
+
+
+def benchmarkLayout(sizes):
+    import GraphLayout
+    from PyQt5 import QtWidgets
+    from GraphGuiClasses import GraphScene
+    app = QtWidgets.QApplication.instance() or QtWidgets.QApplication(sys.argv)
+    with tempfile.TemporaryDirectory() as directory:
+        for size in sizes:
+            path, bn = saveSynthetic(size, directory, positions=False)
+            scene = GraphScene()
+            start = time.perf_counter()
+            scene.importBN(path)
+            app.processEvents()
+            elapsed = time.perf_counter() - start
+            names = scene.model.names()
+            arcs = scene.model.arcs()
+            times = []
+            for method in ('layered', 'force'):
+                start = time.perf_counter()
+                GraphLayout.layout(names, arcs, method)
+                times.append(time.perf_counter() - start)
+            print("layout {:>6} nodes {:>6} arcs: import {:6.2f} s, layered {:6.2f} s, force {:6.2f} s".format(
+                size, bn.sizeArcs(), elapsed, times[0], times[1]))
+
+
+def benchmarkProject(sizes):
+    from BayesianModel import BayesianModel
+    with tempfile.TemporaryDirectory() as directory:
+        for size in sizes:
+            bn, positions = syntheticNetwork(size, states=20)
+            bn.generateCPTs()
+            model = BayesianModel()
+            model.setNetwork(bn, positions)
+            cells = sum(bn.cpt(node).domainSize() for node in bn.nodes())
+            times = []
+            for extension in ('.bif', '.bnp'):
+                path = os.path.join(directory, 'synthetic{}{}'.format(size, extension))
+                start = time.perf_counter()
+                model.save(path)
+                saved = time.perf_counter() - start
+                loaded = BayesianModel()
+                start = time.perf_counter()
+                loaded.load(path)
+                load = time.perf_counter() - start
+                start = time.perf_counter()
+                loaded.cptTable('n' + str(size - 1)).array()
+                times += [saved, load, time.perf_counter() - start, os.path.getsize(path) / 1e6]
+            print("project {:>5} nodes {:>9} CPT cells: BIF save {:6.2f} s load {:6.2f} s first CPT {:6.3f} s "
+                  "{:6.1f} MB, project save {:6.2f} s load {:6.2f} s first CPT {:6.3f} s {:6.1f} MB".format(
+                      size, cells, *times))
+
+
+def benchmarkRepaint(sizes, frames=100):
+    from PyQt5 import QtCore, QtGui, QtWidgets
+    from GraphGuiClasses import GraphView
+    app = QtWidgets.QApplication.instance() or QtWidgets.QApplication(sys.argv)
+    with tempfile.TemporaryDirectory() as directory:
+        for size in sizes:
+            scene, bn = importScene(size, directory)
+            view = GraphView()
+            view.setScene(scene)
+            view.resize(1200, 900)
+            view.show()
+            view.zoomToFit()  # every item is drawn
+            app.processEvents()
+            # drag the node in the middle of the network, the events go through the view as real mouse moves
+            node = scene.nodes['n' + str(size // 2)]
+            start = view.mapFromScene(QtCore.QPointF(node.x + 20, node.y + 20))
+            began = time.perf_counter()
+            for frame in range(frames):
+                position = QtCore.QPointF(start.x() + frame % 20, start.y() + frame % 20)
+                move = QtGui.QMouseEvent(QtCore.QEvent.MouseMove, position, QtCore.Qt.LeftButton,
+                                         QtCore.Qt.LeftButton, QtCore.Qt.NoModifier)
+                QtWidgets.QApplication.sendEvent(view.viewport(), move)
+                app.processEvents()  # the view repaints the areas of the node and of its edges
+            drag = frames / (time.perf_counter() - began)
+            release = QtGui.QMouseEvent(QtCore.QEvent.MouseButtonRelease, QtCore.QPointF(start), QtCore.Qt.LeftButton,
+                                        QtCore.Qt.NoButton, QtCore.Qt.NoModifier)
+            QtWidgets.QApplication.sendEvent(view.viewport(), release)
+            began = time.perf_counter()
+            for frame in range(frames // 10):
+                view.viewport().update()
+                view.viewport().repaint()
+            full = frames // 10 / (time.perf_counter() - began)
+            print("repaint {:>6} nodes {:>6} arcs: drag {:7.1f} frames/s, full view {:6.1f} frames/s".format(
+                size, bn.sizeArcs(), drag, full))
+
+
+if __name__ == "__main__":
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    benchmark = sys.argv[1] if len(sys.argv) > 1 else "import"
+    sizes = [int(size) for size in sys.argv[2:]] or [1000, 5000, 10000]
+    if benchmark == "import":
+        benchmarkImport(sizes)
+    elif benchmark == "layout":
+        benchmarkLayout(sizes)
+    elif benchmark == "project":
+        benchmarkProject(sizes)
+    elif benchmark == "repaint":
+        benchmarkRepaint(sizes)
+    else:
+        print("Unknown benchmark: " + benchmark)
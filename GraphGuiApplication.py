@@ -1,10 +1,14 @@
+import StartupProfile  # first, so that --profile-startup can time the imports below
 import webbrowser
 
+import pyAgrum as gum
 from PyQt5 import QtCore, QtGui, QtWidgets
 from PyQt5.QtWidgets import QFileDialog
 
+from Autosave import Autosave
 from GraphControlPanelGui import Ui_GraphControlWindow as GraphControlPanel
-from GraphGuiClasses import GraphScene
+from GraphGuiClasses import GraphScene, GraphView, INFERENCE_NAMES
+from ProjectFile import PROJECT_EXTENSION
 
 ''' Graph GUI 
   
@@ -21,6 +25,29 @@ from GraphGuiClasses import GraphScene
 '''
 
 
+# Files that can be imported and exported: BIF with its _LOC.txt file, or a single binary project file
+PROJECT_FILTER = "Project (*" + PROJECT_EXTENSION + ")"
+FILE_FILTERS = "BIF (*.bif);;" + PROJECT_FILTER
+AUTOSAVE_POLL = 1000  # milliseconds between two checks of the autosave
+COST_POLL = 200  # milliseconds between two checks of the estimate of the inference cost
+
+
+def formatCount(count):
+    # the cliques of dense networks have more cells than a float can hold, only their order of magnitude is shown
+    if count < 10 ** 6:
+        return str(count)
+    if count < 10 ** 300:
+        return "{:.3g}".format(count)
+    return "1e+{}".format(len(str(count)) - 1)
+
+
+def formatBytes(size):
+    for power, unit in enumerate(("B", "KB", "MB", "GB")):
+        if size < 1024 ** (power + 1):
+            return "{:.4g} {}".format(size / 1024 ** power, unit)
+    return formatCount(size // 1024 ** 4) + " TB"
+
+
 class Ui_MainWindow(object):
     def setupUi(self, MainWindow):
         self.MainWindow = MainWindow
@@ -30,7 +57,7 @@ class Ui_MainWindow(object):
         self.MainWindow.setContextMenuPolicy(QtCore.Qt.PreventContextMenu)
         self.centralwidget = QtWidgets.QWidget(self.MainWindow)
         self.centralwidget.setObjectName("centralwidget")
-        self.graphView = QtWidgets.QGraphicsView(self.centralwidget)
+        self.graphView = GraphView(self.centralwidget)  # zoom with the wheel, pan with the middle button
         self.graphView.setObjectName("graphView")
 
         # using the MainWindow passed into the funtion, add a graph scene 
@@ -99,6 +126,86 @@ class Ui_MainWindow(object):
         self.gridLayout_2.addWidget(self.num_edges_val, 1, 1, 1, 1)
         self.verticalLayout.addLayout(self.gridLayout_2)
 
+        # estimated cost of an exact inference, computed again in the background when the arcs are edited
+        self.costLayout = QtWidgets.QGridLayout()
+        self.costLayout.setObjectName("costLayout")
+        self.treewidth_lab = QtWidgets.QLabel(self.centralwidget)
+        self.costLayout.addWidget(self.treewidth_lab, 0, 0, 1, 1)
+        self.treewidth_val = QtWidgets.QLabel(self.centralwidget)
+        self.costLayout.addWidget(self.treewidth_val, 0, 1, 1, 1)
+        self.largest_clique_lab = QtWidgets.QLabel(self.centralwidget)
+        self.costLayout.addWidget(self.largest_clique_lab, 1, 0, 1, 1)
+        self.largest_clique_val = QtWidgets.QLabel(self.centralwidget)
+        self.costLayout.addWidget(self.largest_clique_val, 1, 1, 1, 1)
+        self.junction_tree_lab = QtWidgets.QLabel(self.centralwidget)
+        self.costLayout.addWidget(self.junction_tree_lab, 2, 0, 1, 1)
+        self.junction_tree_val = QtWidgets.QLabel(self.centralwidget)
+        self.costLayout.addWidget(self.junction_tree_val, 2, 1, 1, 1)
+        self.verticalLayout.addLayout(self.costLayout)
+
+        # posteriors of all the nodes drawn on the scene
+        self.posteriors_lab = QtWidgets.QLabel(self.centralwidget)
+        font = QtGui.QFont()
+        font.setPointSize(12)
+        font.setBold(True)
+        font.setWeight(75)
+        self.posteriors_lab.setFont(font)
+        self.posteriors_lab.setAlignment(QtCore.Qt.AlignBottom | QtCore.Qt.AlignHCenter)
+        self.posteriors_lab.setObjectName("posteriors_lab")
+        self.verticalLayout.addWidget(self.posteriors_lab)
+        self.posteriors_mode = QtWidgets.QComboBox(self.centralwidget)
+        self.posteriors_mode.addItems(INFERENCE_NAMES)
+        self.posteriors_mode.setObjectName("posteriors_mode")
+        self.verticalLayout.addWidget(self.posteriors_mode)
+
+        # stopping criteria of the approximate engines, for the posteriors and the inference of the CPT windows
+        self.stoppingLayout = QtWidgets.QGridLayout()
+        self.stoppingLayout.setObjectName("stoppingLayout")
+        self.max_time_lab = QtWidgets.QLabel(self.centralwidget)
+        self.stoppingLayout.addWidget(self.max_time_lab, 0, 0, 1, 1)
+        self.max_time_val = QtWidgets.QDoubleSpinBox(self.centralwidget)
+        self.max_time_val.setRange(0.1, 3600)
+        self.max_time_val.setSuffix(" s")
+        self.max_time_val.setValue(self.scene.model.stopping["maxTime"])
+        self.stoppingLayout.addWidget(self.max_time_val, 0, 1, 1, 1)
+        self.epsilon_lab = QtWidgets.QLabel(self.centralwidget)
+        self.stoppingLayout.addWidget(self.epsilon_lab, 1, 0, 1, 1)
+        self.epsilon_val = QtWidgets.QDoubleSpinBox(self.centralwidget)
+        self.epsilon_val.setDecimals(6)
+        self.epsilon_val.setRange(1e-6, 1)
+        self.epsilon_val.setSingleStep(1e-3)
+        self.epsilon_val.setValue(self.scene.model.stopping["epsilon"])
+        self.stoppingLayout.addWidget(self.epsilon_val, 1, 1, 1, 1)
+        self.max_iterations_lab = QtWidgets.QLabel(self.centralwidget)
+        self.stoppingLayout.addWidget(self.max_iterations_lab, 2, 0, 1, 1)
+        self.max_iterations_val = QtWidgets.QSpinBox(self.centralwidget)
+        self.max_iterations_val.setRange(1, 2 ** 31 - 1)
+        self.max_iterations_val.setValue(self.scene.model.stopping["maxIterations"])
+        self.stoppingLayout.addWidget(self.max_iterations_val, 2, 1, 1, 1)
+        self.verticalLayout.addLayout(self.stoppingLayout)
+
+        # results of the inference kept for the queries asked again
+        self.cacheLayout = QtWidgets.QGridLayout()
+        self.cacheLayout.setObjectName("cacheLayout")
+        self.cache_size_lab = QtWidgets.QLabel(self.centralwidget)
+        self.cacheLayout.addWidget(self.cache_size_lab, 0, 0, 1, 1)
+        self.cache_size_val = QtWidgets.QSpinBox(self.centralwidget)
+        self.cache_size_val.setRange(0, 2 ** 20)
+        self.cache_size_val.setSuffix(" MB")
+        self.cache_size_val.setValue(self.scene.model.posteriorCache.maxBytes // 2 ** 20)
+        self.cacheLayout.addWidget(self.cache_size_val, 0, 1, 1, 1)
+        self.cache_hits_lab = QtWidgets.QLabel(self.centralwidget)
+        self.cacheLayout.addWidget(self.cache_hits_lab, 1, 0, 1, 1)
+        self.cache_hits_val = QtWidgets.QLabel(self.centralwidget)
+        self.cacheLayout.addWidget(self.cache_hits_val, 1, 1, 1, 1)
+        self.verticalLayout.addLayout(self.cacheLayout)
+        self.show_posteriors_btn = QtWidgets.QPushButton(self.centralwidget)
+        self.show_posteriors_btn.setObjectName("show_posteriors_btn")
+        self.verticalLayout.addWidget(self.show_posteriors_btn)
+        self.hide_posteriors_btn = QtWidgets.QPushButton(self.centralwidget)
+        self.hide_posteriors_btn.setObjectName("hide_posteriors_btn")
+        self.verticalLayout.addWidget(self.hide_posteriors_btn)
+
         # add button for pulling up control panel
         self.control_panel_btn = QtWidgets.QPushButton(self.centralwidget)
         self.control_panel_btn.setObjectName("control_panel_btn")
@@ -132,19 +239,61 @@ class Ui_MainWindow(object):
         self.statusbar = QtWidgets.QStatusBar(self.MainWindow)
         self.statusbar.setObjectName("statusbar")
         self.MainWindow.setStatusBar(self.statusbar)
+        # busy indicator and cancel button, shown while an inference is running
+        self.inference_progress = QtWidgets.QProgressBar(self.statusbar)
+        self.inference_progress.setRange(0, 0)
+        self.inference_progress.setMaximumWidth(150)
+        self.inference_progress.hide()
+        self.statusbar.addPermanentWidget(self.inference_progress)
+        # progress of the import of a file
+        self.import_progress = QtWidgets.QProgressBar(self.statusbar)
+        self.import_progress.setMaximumWidth(150)
+        self.import_progress.hide()
+        self.statusbar.addPermanentWidget(self.import_progress)
+        self.cancel_inference_btn = QtWidgets.QPushButton(self.statusbar)
+        self.cancel_inference_btn.setObjectName("cancel_inference_btn")
+        self.cancel_inference_btn.hide()
+        self.statusbar.addPermanentWidget(self.cancel_inference_btn)
         self.menubar.addAction(self.menu.menuAction())
         self.retranslateUi(self.MainWindow)  # call retranslateUi function
         QtCore.QMetaObject.connectSlotsByName(self.MainWindow)
 
+        # save the network in the background while it is edited, the timer only polls the autosave
+        self.autosave = Autosave(self.scene.model)
+        self.autosave_timer = QtCore.QTimer(self.MainWindow)
+        self.autosave_timer.timeout.connect(lambda: self.update_autosave())
+        self.autosave_timer.start(AUTOSAVE_POLL)
+        self.cost_timer = QtCore.QTimer(self.MainWindow)
+        self.cost_timer.timeout.connect(lambda: self.update_cost())
+        self.cost_timer.start(COST_POLL)
+
         self.button_setup()
 
     def button_setup(self):
         # connect the MainWindows init_control_panel function to button
         self.control_panel_btn.clicked.connect(lambda: self.MainWindow.init_control_pane())
 
+        # compute the posteriors of all the nodes with a single propagation
+        self.show_posteriors_btn.clicked.connect(
+            lambda: self.scene.computePosteriors(self.posteriors_mode.currentIndex()))
+        self.hide_posteriors_btn.clicked.connect(lambda: self.scene.clearPosteriors())
+        self.max_time_val.valueChanged.connect(lambda value: self.set_stopping("maxTime", value))
+        self.epsilon_val.valueChanged.connect(lambda value: self.set_stopping("epsilon", value))
+        self.max_iterations_val.valueChanged.connect(lambda value: self.set_stopping("maxIterations", value))
+        self.cache_size_val.valueChanged.connect(lambda value: self.set_cache_size(value))
+
         # connect update_data function to signal 
         self.scene.data_updater.signal.connect(lambda: self.update_data())
 
+        # show the progress of the inference in the status bar
+        self.scene.inference_updater.signal.connect(
+            lambda message, running: self.update_inference(message, running))
+        self.cancel_inference_btn.clicked.connect(lambda: self.scene.cancelInference())
+
+        # show the progress of the import of a file in the status bar
+        self.scene.import_updater.signal.connect(
+            lambda message, done, total: self.update_import(message, done, total))
+
     def retranslateUi(self, MainWindow):
         _translate = QtCore.QCoreApplication.translate
 
@@ -155,7 +304,20 @@ class Ui_MainWindow(object):
         self.edge_count_lab.setText(_translate("MainWindow", "Arc  Count:"))
         self.num_nodes_val.setText(_translate("MainWindow", "0"))
         self.num_edges_val.setText(_translate("MainWindow", "0"))
+        self.treewidth_lab.setText(_translate("MainWindow", "Treewidth:"))
+        self.largest_clique_lab.setText(_translate("MainWindow", "Largest clique:"))
+        self.junction_tree_lab.setText(_translate("MainWindow", "Junction tree:"))
         self.control_panel_btn.setText(_translate("MainWindow", "CONTROL PANEL"))
+        self.posteriors_lab.setText(_translate("MainWindow", "-Posteriors-"))
+        self.show_posteriors_btn.setText(_translate("MainWindow", "COMPUTE ALL POSTERIORS"))
+        self.hide_posteriors_btn.setText(_translate("MainWindow", "HIDE POSTERIORS"))
+        self.max_time_lab.setText(_translate("MainWindow", "Max time:"))
+        self.epsilon_lab.setText(_translate("MainWindow", "Epsilon:"))
+        self.max_iterations_lab.setText(_translate("MainWindow", "Max samples:"))
+        self.cache_size_lab.setText(_translate("MainWindow", "Posterior cache:"))
+        self.cache_hits_lab.setText(_translate("MainWindow", "Cache hits:"))
+        self.cache_hits_val.setText(_translate("MainWindow", "0 of 0, 0 B kept"))
+        self.cancel_inference_btn.setText(_translate("MainWindow", "Cancel"))
 
         self.menu.setTitle(_translate("MainWindow", "File"))
 
@@ -168,16 +330,70 @@ class Ui_MainWindow(object):
         self.num_nodes_val.setText(_translate("MainWindow", str(len(self.scene.nodes))))
         self.num_edges_val.setText(_translate("MainWindow", str(len(self.scene.edges))))
 
+    def update_cost(self):
+        # function is called regularly, the estimator triangulates the network again after a structural edit
+        estimate = self.scene.model.cost.poll()
+        if estimate is None:
+            return
+        self.treewidth_val.setText(str(estimate["treewidth"]))
+        self.largest_clique_val.setText("{} cells, {}".format(formatCount(estimate["largestCells"]),
+                                                              formatBytes(estimate["largestBytes"])))
+        self.junction_tree_val.setText(formatBytes(estimate["totalBytes"]))
+
+    def set_stopping(self, criterion, value):
+        # the approximate engines read the criteria of the model at every inference
+        self.scene.model.stopping[criterion] = value
+
+    def set_cache_size(self, value):
+        # the least recently used posteriors are dropped at once if the cache no longer fits
+        self.scene.model.posteriorCache.setLimits(maxBytes=value * 2 ** 20)
+        self.update_cache()
+
+    def update_cache(self):
+        cache = self.scene.model.posteriorCache
+        self.cache_hits_val.setText("{} of {}, {} kept".format(cache.hits, cache.hits + cache.misses,
+                                                                formatBytes(cache.size)))
+
+    @QtCore.pyqtSlot(str, bool)
+    def update_inference(self, message, running):
+        # function is called when the running inference reports its status
+        self.statusbar.showMessage(message)
+        self.inference_progress.setVisible(running)
+        self.cancel_inference_btn.setVisible(running)
+        if not running:  # The query was answered by the cache or its result was just added to it
+            self.update_cache()
+
+    @QtCore.pyqtSlot(str, int, int)
+    def update_import(self, message, done, total):
+        # function is called when the import of a file reports its progress, the import does not return to the
+        # event loop until it is over so the status bar is repainted at once
+        self.statusbar.showMessage(message)
+        self.import_progress.setVisible(bool(message))
+        self.import_progress.setRange(0, total)
+        self.import_progress.setValue(done)
+        self.statusbar.repaint()
+
+    def update_autosave(self):
+        # function is called regularly to start the next autosave and show the result of the last one
+        message = self.autosave.poll()
+        if message:
+            self.statusbar.showMessage(message, 5000)
+
     def save_BN(self, menu):
-        path, __ = QFileDialog.getSaveFileName(menu, 'Export BN', "BN.bif", "BIF (*.bif)")
+        path, fileFilter = QFileDialog.getSaveFileName(menu, 'Export BN', "BN.bif", FILE_FILTERS)
         if path:  # Procedo all'export solo se è stato selezionato un percorso
-            self.scene.bn.saveBIF(path)
-            self.scene.saveNodesLocation(path)
+            if fileFilter == PROJECT_FILTER and not path.endswith(PROJECT_EXTENSION):
+                path += PROJECT_EXTENSION
+            try:
+                self.scene.model.save(path)
+            except (OSError, gum.IOError) as e:  # The previous file is left intact
+                self.scene.InvalidInMsg.setText("The network could not be saved:\n{}".format(e))
+                self.scene.InvalidInMsg.exec_()
 
     def load_BN(self, menu):
-        file, __ = QFileDialog.getOpenFileName(menu, 'Import BN', "BN.bif", "BIF (*.bif)")
+        file, __ = QFileDialog.getOpenFileName(menu, 'Import BN', "BN.bif", FILE_FILTERS)
         if file:
-            self.scene.importBN(file)
+            self.scene.importBN(file, background=True)  # the file is parsed in a worker thread
 
 
 class SceneConnectedComboBox(QtWidgets.QComboBox):
@@ -197,20 +413,20 @@ class MainGraphWindow(QtWidgets.QMainWindow):
 
         self.graph_scene = GraphScene()  # initialize it with a graph scene
 
-        self.app = QtWidgets.QApplication([])
-        self.screen_resolution = app.desktop().screenGeometry()
+        self.app = QtWidgets.QApplication.instance()  # created by the caller, a second one would slow the start
+        self.screen_resolution = self.app.desktop().screenGeometry()
         self.width = self.screen_resolution.width()
         self.height = self.screen_resolution.height()
 
         self.init_control_pane()  # also intitialize with a control panel
 
     def init_control_pane(self):
-        self.setGeometry(self.width / 4 + 5, 40, 3 * self.width / 4,
+        self.setGeometry(self.width // 4 + 5, 40, 3 * self.width // 4,
                          self.height - 100)  # main window take up 3/4 of the total width of the screen
         self.GraphControlWindow = QtWidgets.QWidget()  # create an new control panel window
         ui = GraphControlPanel()
         ui.setupUi(self.GraphControlWindow, self.graph_scene)
-        self.GraphControlWindow.setGeometry(0, 40, self.width / 4,
+        self.GraphControlWindow.setGeometry(0, 40, self.width // 4,
                                             self.height - 100)  # control panel takes 1/4 of the total width of the screen
         self.GraphControlWindow.show()  # display control panel
 
@@ -219,11 +435,15 @@ class MainGraphWindow(QtWidgets.QMainWindow):
 
 
 if __name__ == "__main__":
+    import multiprocessing
     import sys
 
+    multiprocessing.freeze_support()  # the inference runs in a spawned process
     app = QtWidgets.QApplication(sys.argv)
     MainWindow = MainGraphWindow()
     ui = Ui_MainWindow()
     ui.setupUi(MainWindow)
     MainWindow.show()
+    if StartupProfile.ENABLED:  # Report once the event loop has drawn the first frame
+        QtCore.QTimer.singleShot(0, lambda: StartupProfile.report("first frame"))
     sys.exit(app.exec_())
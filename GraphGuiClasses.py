@@ -1,10 +1,14 @@
+import contextlib
 import math
+import time
 
 import pyAgrum as gum
 from PyQt5 import QtCore, QtGui, QtWidgets
 from PyQt5.QtWidgets import QInputDialog, QDialog
 
-from NodeCPTGui import Ui_CPTWindow
+from BayesianModel import BayesianModel, readNetwork
+from InferenceServer import INFERENCE_NAMES
+from ProjectFile import RANGE_TYPE, isProject
 
 ''' Graph GUI Classes
   
@@ -20,6 +24,39 @@ from NodeCPTGui import Ui_CPTWindow
 
 '''
 
+# Stacking order of the items in the scene: nodes over highlighted edges over edges
+EDGE_Z = 0
+HIGHLIGHTED_EDGE_Z = 1
+NODE_Z = 2
+LABEL_FONTS = {}  # fonts of the node labels by point size, shared by all the nodes
+# Level of detail, the scale of the view, under which the items are drawn without their details
+TEXT_LOD = 0.5  # names, posteriors and arrow heads are not readable
+SIMPLE_LOD = 0.2  # nodes are drawn as squares without border and edges as thin lines
+SCENE_MARGIN = 500  # space kept around the items when the scene grows
+ZOOM_RANGE = (0.02, 5.0)  # smallest and largest scale of the view
+PROGRESS_STEP = 2000  # items created by an import between two progress reports
+
+
+def labelFont(size):
+    if size not in LABEL_FONTS:
+        LABEL_FONTS[size] = QtGui.QFont('Decorative', size)
+    return LABEL_FONTS[size]
+
+
+def formatAccuracy(accuracy):
+    # error reached by an approximate inference as shown to the user, None for an exact inference
+    if accuracy is None:
+        return None
+    # The engine can stop before the end of the first period of its stopping test
+    error = 'error not measured' if math.isnan(accuracy["epsilon"]) else 'error {:.2g}'.format(accuracy["epsilon"])
+    return '{} after {} iterations in {:.2f} s ({})'.format(
+        error, accuracy["iterations"], accuracy["time"], accuracy["stopped"])
+
+
+def formatPruning(kept, total):
+    # size of the network pruned for the posterior of a single node as shown to the user
+    return 'network pruned to {} of {} nodes'.format(kept, total)
+
 
 class InputDialog(QDialog):
     def __init__(self):
@@ -63,7 +100,84 @@ class InputDialog(QDialog):
             self.InvalidInMsg.exec_()
 
 
+class EvidenceDialog(QDialog):
+    def __init__(self, variable, evidence):
+        super().__init__()
+        self.variable = variable
+        self.evidence = evidence  # index of the observed state, list of likelihoods or None
+        self.grid = QtWidgets.QGridLayout()
+        self.setWindowTitle("Evidence on " + variable.name())
+        font = QtGui.QFont()
+        font.setPointSize(12)
+        font.setBold(True)
+        font.setWeight(75)
+        label = QtWidgets.QLabel()
+        label.setFont(font)
+        label.setAlignment(QtCore.Qt.AlignCenter)
+        label.setText("Observed state:")
+        self.grid.addWidget(label, 0, 0)
+        self.states = QtWidgets.QComboBox()
+        self.states.addItems(["No evidence"] + [variable.label(i) for i in range(variable.domainSize())] +
+                             ["Likelihood"])
+        self.grid.addWidget(self.states, 0, 1)
+        label = QtWidgets.QLabel()
+        label.setFont(font)
+        label.setAlignment(QtCore.Qt.AlignCenter)
+        label.setText("Likelihood:")
+        self.grid.addWidget(label, 1, 0)
+        self.likelihood = QtWidgets.QLineEdit()
+        self.likelihood.setPlaceholderText(", ".join(["1"] * variable.domainSize()))
+        self.grid.addWidget(self.likelihood, 1, 1)
+        if isinstance(evidence, list):
+            self.states.setCurrentIndex(self.states.count() - 1)
+            self.likelihood.setText(", ".join(str(value) for value in evidence))
+        elif evidence is not None:
+            self.states.setCurrentIndex(evidence + 1)
+        self.likelihood.setEnabled(isinstance(evidence, list))
+        self.states.currentIndexChanged.connect(
+            lambda index: self.likelihood.setEnabled(index == self.states.count() - 1))
+        button = QtWidgets.QPushButton('OK', self)
+        button.clicked.connect(self.closeWindow)
+        self.grid.addWidget(button, 2, 0, 1, 2)
+        self.setLayout(self.grid)
+
+        # set up message box for displaying invalid input alerts
+        self.InvalidInMsg = QtWidgets.QMessageBox()
+        self.InvalidInMsg.setStandardButtons(QtWidgets.QMessageBox.Ok)
+        self.InvalidInMsg.setWindowTitle('Invalid input alert!')
+
+    def closeWindow(self):
+        index = self.states.currentIndex()
+        if index == 0:
+            self.evidence = None
+        elif index < self.states.count() - 1:
+            self.evidence = index - 1
+        else:
+            try:
+                likelihood = [float(value) for value in self.likelihood.text().split(",")]
+            except ValueError:
+                likelihood = []
+            if len(likelihood) != self.variable.domainSize() or min(likelihood) < 0 or max(likelihood) == 0:
+                self.InvalidInMsg.setText("The likelihood must be {} non negative values separated by commas, "
+                                          "not all zero".format(self.variable.domainSize()))
+                self.InvalidInMsg.exec_()
+                return
+            self.evidence = likelihood
+        self.accept()
+
+
 class Node(QtWidgets.QGraphicsItem):
+    # pens and brushes shared by all the nodes instead of being created at every paint
+    PEN = QtGui.QPen(QtCore.Qt.red)
+    SELECTED_PEN = QtGui.QPen(QtCore.Qt.green)
+    EVIDENCE_PEN = QtGui.QPen(QtGui.QColor(30, 60, 220), 3)
+    TEXT_PEN = QtGui.QPen(QtCore.Qt.black)
+    SPARKLINE_PEN = QtGui.QPen(QtGui.QColor(50, 50, 200), 1)
+    BRUSH = QtGui.QBrush(QtGui.QColor(255, 165, 0, 255))
+    SELECTED_BRUSH = QtGui.QBrush(QtGui.QColor(255, 50, 0, 255))
+    HIGHLIGHTED_BRUSH = QtGui.QBrush(QtGui.QColor(165, 255, 0, 255))
+    POSTERIOR_BRUSH = QtGui.QBrush(QtGui.QColor(255, 255, 255, 200))
+
     def __init__(self, x, y, val):
 
         super().__init__()
@@ -71,142 +185,221 @@ class Node(QtWidgets.QGraphicsItem):
         self.x = x  # set x coordinate of node
         self.y = y  # set y coordinate of node
         self.val = val  # set node value
-        self.parents = []  # name of parents
-        self.children = []  # name of children
         self.highlighted = False
         self.selected = False
+        self.posterior = None  # view on the posterior of the node in the scene's PosteriorStore
+        self.evidence = False  # the node is observed
+        self.rangeVariable = False
+        self.labels = []
+        self.updateBounds()
+        self.font = labelFont(int(10 / len(str(val)) + 5))  # smaller font for longer names
+        self.setZValue(NODE_Z)  # nodes are always drawn over the edges
+        # the node is painted once in a pixmap reused by every repaint until it moves or calls update()
+        self.setCacheMode(QtWidgets.QGraphicsItem.DeviceCoordinateCache)
+
+    def moveTo(self, x, y):
+        self.prepareGeometryChange()  # the bounding rect follows the position of the node
+        self.x = x
+        self.y = y
+        self.updateBounds()
+
+    def updateBounds(self):
+        # the ellipse and its border, the posterior is drawn below it; asked at every repaint so kept until a change
+        if self.posterior is not None:
+            self.bounds = QtCore.QRectF(self.x - 10, self.y - 2, 60, 58)
+        else:
+            self.bounds = QtCore.QRectF(self.x - 2, self.y - 2, 44, 44)
+
+    def setPosterior(self, posterior, rangeVariable=False, labels=()):
+        self.prepareGeometryChange()  # the posterior is drawn below the node
+        self.posterior = posterior
+        self.rangeVariable = rangeVariable
+        self.labels = labels
+        self.updateBounds()
+        self.update()
 
     def paint(self, painter, option, widget):
+        lod = option.levelOfDetailFromTransform(painter.worldTransform())
+        if lod < SIMPLE_LOD:
+            # a few pixels wide: only the colour of the node is visible
+            if self.selected:
+                brush = self.SELECTED_BRUSH
+            elif self.evidence:
+                brush = self.EVIDENCE_PEN.brush()  # the colour of the border of the observed nodes
+            elif self.highlighted:
+                brush = self.HIGHLIGHTED_BRUSH
+            else:
+                brush = self.BRUSH
+            painter.fillRect(QtCore.QRectF(self.x, self.y, 40, 40), brush)
+            return
 
         if self.selected:
             # if the node is seleted paint it red
-            painter.setPen(QtCore.Qt.green)
-            painter.setBrush(QtGui.QColor(255, 50, 0, 255))
+            painter.setPen(self.SELECTED_PEN)
+            painter.setBrush(self.SELECTED_BRUSH)
         elif self.highlighted:
             # if the node is highlighted paint it green
-            painter.setPen(QtCore.Qt.green)
-            painter.setBrush(QtGui.QColor(165, 255, 0, 255))
+            painter.setPen(self.SELECTED_PEN)
+            painter.setBrush(self.HIGHLIGHTED_BRUSH)
         else:
             # otehrwise paint it orange
-            painter.setPen(QtCore.Qt.red)
-            painter.setBrush(QtGui.QColor(255, 165, 0, 255))
+            painter.setPen(self.PEN)
+            painter.setBrush(self.BRUSH)
+        if self.evidence:
+            # observed nodes get a thick blue border
+            painter.setPen(self.EVIDENCE_PEN)
         # paint the node to the scene
-        painter.drawEllipse(QtCore.QRect(self.x, self.y, 40, 40))
-        painter.setPen(QtCore.Qt.black)
-        painter.setFont(QtGui.QFont('Decorative', (10 / len(str(self.val)) + 5)))
-        painter.drawText(QtCore.QRect(self.x, self.y, 40, 40), QtCore.Qt.AlignCenter, self.val)
+        painter.drawEllipse(QtCore.QRectF(self.x, self.y, 40, 40))
+        if lod < TEXT_LOD:
+            return
+        painter.setPen(self.TEXT_PEN)
+        painter.setFont(self.font)
+        painter.drawText(QtCore.QRectF(self.x, self.y, 40, 40), QtCore.Qt.AlignCenter, self.val)
+        if self.posterior is not None:
+            self.paintPosterior(painter)
+
+    def paintPosterior(self, painter):
+        area = QtCore.QRectF(self.x - 10, self.y + 42, 60, 14)
+        if self.rangeVariable:
+            # sparkline of the distribution, scaled on its highest probability
+            painter.setPen(QtCore.Qt.NoPen)
+            painter.setBrush(self.POSTERIOR_BRUSH)
+            painter.drawRect(area)
+            peak = self.posterior.max()
+            if peak > 0:
+                step = area.width() / max(len(self.posterior) - 1, 1)
+                points = [QtCore.QPointF(area.left() + i * step, area.bottom() - area.height() * p / peak)
+                          for i, p in enumerate(self.posterior)]
+                painter.setPen(self.SPARKLINE_PEN)
+                painter.drawPolyline(QtGui.QPolygonF(points))
+        else:
+            # percentage of the last state for binary variables, of the most probable one otherwise
+            state = len(self.posterior) - 1 if len(self.posterior) == 2 else int(self.posterior.argmax())
+            painter.setPen(self.TEXT_PEN)
+            painter.setFont(labelFont(7))
+            painter.drawText(area, QtCore.Qt.AlignCenter,
+                             '{}: {:.1f}%'.format(self.labels[state], 100 * self.posterior[state]))
 
     def boundingRect(self):
-        return QtCore.QRectF(self.x, self.y, 37, 37)
+        return self.bounds
 
 
 class Edge(QtWidgets.QGraphicsItem):
+    # pens and brushes shared by all the edges instead of being created at every paint
+    PEN = QtGui.QPen(QtGui.QColor(250, 100, 100, 255), 3)
+    ARROW_PEN = QtGui.QPen(QtCore.Qt.red, 3)
+    HIGHLIGHTED_PEN = QtGui.QPen(QtGui.QColor(50, 175, 50, 200), 3)
+    BRUSH = QtGui.QBrush(QtGui.QColor(250, 100, 100, 255))
+    HIGHLIGHTED_BRUSH = QtGui.QBrush(QtGui.QColor(165, 255, 0, 255))
+    THIN_PEN = QtGui.QPen(QtGui.QColor(250, 100, 100, 255), 0)  # one pixel wide at any zoom
+    THIN_HIGHLIGHTED_PEN = QtGui.QPen(QtGui.QColor(50, 175, 50, 200), 0)
+
     def __init__(self, node1, node2):
 
         super().__init__()
         self.node1 = node1  # set node at one end of edge
         self.node2 = node2  # set node at other end of edge
-        self.x1 = node1.x + 20  # set x coordinate of one end of edge
-        self.y1 = node1.y + 20  # set y coordinate of one end of edge
-        self.x2 = node2.x + 20  # set x coordinate of other end of edge
-        self.y2 = node2.y + 20  # set y coordinate of other end of edge
-
         self.highlighted = False
+        self.arrow = QtGui.QPolygonF()  # arrow head, recomputed only when one of the nodes moves
+        self.setZValue(EDGE_Z)
+        self.updatePosition()
+
+    def updatePosition(self):
+        # called when one of the nodes moves: the scene index and the repainted area follow the new geometry
+        self.prepareGeometryChange()
+        self.x1 = self.node1.x + 20  # set x coordinate of one end of edge
+        self.y1 = self.node1.y + 20  # set y coordinate of one end of edge
+        self.x2 = self.node2.x + 20  # set x coordinate of other end of edge
+        self.y2 = self.node2.y + 20  # set y coordinate of other end of edge
+        if (self.x1, self.y1) == (self.x2, self.y2):  # No direction to point to
+            self.arrow = QtGui.QPolygonF()
+        else:
+            point_array = self.get_directed_arrow_points(self.x1, self.y1, self.x2, self.y2,
+                                                         20)  # get coordinates of arrow vertices
+            self.arrow = QtGui.QPolygonF([QtCore.QPointF(x, y) for x, y in point_array])
+        self.line = QtCore.QLineF(self.x1, self.y1, self.x2, self.y2)
+        # line and arrow head, enlarged by half the width of the pen; asked at every repaint so kept until a move
+        bounds = QtCore.QRectF(self.line.p1(), self.line.p2()).normalized()
+        self.bounds = bounds.united(self.arrow.boundingRect()).adjusted(-2, -2, 2, 2)
+        self.path = None  # shape of the edge, computed when it is first needed
 
     def get_directed_arrow_points(self, x1, y1, x2, y2, d):
-
-        # get point for head of arrow--
-        v1 = x1 - x2  # x cooridinate for vector between points
-        v2 = y1 - y2  # y coordinate for vicot between points
-
-        # to get unit vector requires: u = v/|v|
-        dom = math.sqrt(math.pow(v1, 2) + math.pow(v2, 2))  # = |v|
-
-        new_x = v1 / dom  # unit vector x component
-        new_y = v2 / dom  # unit vecotr y componenet
-
-        point1 = (
-            x2 + new_x * d, y2 + new_y * d)  # given node radius d, we want to multiply the unit vector by d to get a
-        # vector length d in the direction of the original vector.  Add x2 and y2
-        # so that the point is located on the actual edge
-
-        # get point of another vertex of the triangle-- 
-        p1x = x2 + new_x * d * 2  # get x value of a point along the edge that is twice as far along the edge as the given node radius d
-        p1y = y2 + new_y * d * 2  # get y value of point
-
-        # because we now want a unit vector perpendicular to the original edge
-        v2 = x1 - p1x  # switch x and y vector values
-        v1 = -(y1 - p1y)  # and negate a vector component
-
-        # to get unit vector requires: u = v/|v|
-        dom = math.sqrt(math.pow(v1, 2) + math.pow(v2, 2))  # = |v|
-
-        new_x = v1 / dom  # get unit vector components
-        new_y = v2 / dom
-
-        point2 = (p1x + new_x * d / 2.0, p1y + new_y * d / 2.0)  # length from this point to edge is 1/2 radius of node
-
-        # get point of final vertex of triangle--
-        # because we want the other unit vector perpendicular to the original edge
-        v1 = y1 - p1y  # switch x and y vector values
-        v2 = -(x1 - p1x)  # negate the other vector component this time
-
-        # to get unit vector requires: u = v/|v|
-        dom = math.sqrt(math.pow(v1, 2) + math.pow(v2, 2))  # = |v|
-
-        new_x = v1 / dom  # get unit vector
-        new_y = v2 / dom
-
-        point3 = (p1x + new_x * d / 2.0, p1y + new_y * d / 2.0)  # length from this point to edge is 1/2 radius of node
-
-        return ([point1, point2, point3])  # return a list of the three points
+        # triangle pointing at the border of the node of radius d centered on (x2, y2), the edge comes from (x1, y1)
+        length = math.hypot(x1 - x2, y1 - y2)
+        ux = (x1 - x2) / length  # unit vector along the edge, towards its start
+        uy = (y1 - y2) / length
+        tip = (x2 + ux * d, y2 + uy * d)
+        bx = x2 + ux * d * 2  # middle of the base of the triangle, twice the radius away from the center
+        by = y2 + uy * d * 2
+        # the corners of the base are half the radius away from the edge, along its perpendicular (-uy, ux)
+        return [tip, (bx - uy * d / 2.0, by + ux * d / 2.0), (bx + uy * d / 2.0, by - ux * d / 2.0)]
 
     def paint(self, painter, option, widget):
-        pen = QtGui.QPen()
-        pen.setWidth(3)
+        # line of the edge, then its arrow head filled and outlined
+        lod = option.levelOfDetailFromTransform(painter.worldTransform())
+        if lod < SIMPLE_LOD:
+            painter.setPen(self.THIN_HIGHLIGHTED_PEN if self.highlighted else self.THIN_PEN)
+            painter.drawLine(self.line)
+            return
         if self.highlighted:
             # if edge is highlighted paint it green
-            pen.setColor(QtGui.QColor(50, 175, 50, 200))
-        else:
-            # otherwise paint it red
-            pen.setColor(QtGui.QColor(250, 100, 100, 255))
-        # paint line to represent edge
-        painter.setPen(pen)
-        painter.drawLine(self.x1, self.y1, self.x2, self.y2)  # draw line to represent edge
-
-        if self.highlighted:
-            # if edge is highlighted paint arrow green
-            # pen.setColor(QtCore.Qt.green)
-            painter.setBrush(QtGui.QColor(165, 255, 0, 255))
+            painter.setPen(self.HIGHLIGHTED_PEN)
+            painter.setBrush(self.HIGHLIGHTED_BRUSH)
         else:
             # otherwise paint it red
-            pen.setColor(QtCore.Qt.red)
-            painter.setBrush(QtGui.QColor(250, 100, 100, 255))
-            painter.setPen(pen)
-            point_array = self.get_directed_arrow_points(self.x1, self.y1, self.x2, self.y2,
-                                                         20)  # get coordinates of arrow vertices
-            points = [QtCore.QPointF(point_array[0][0], point_array[0][1]),
-                      QtCore.QPointF(point_array[1][0], point_array[1][1]),
-                      QtCore.QPointF(point_array[2][0], point_array[2][1])]  # create a list of QPointF
-            arrow = QtGui.QPolygonF(points)  # create a triangle with the given points
-            painter.drawPolygon(arrow)  # draw arrow
+            painter.setPen(self.PEN)
+            painter.setBrush(self.BRUSH)
+        painter.drawLine(self.line)  # draw line to represent edge
+        if lod < TEXT_LOD:
+            return
+        painter.setPen(self.HIGHLIGHTED_PEN if self.highlighted else self.ARROW_PEN)
+        painter.drawPolygon(self.arrow)  # draw arrow
 
     def boundingRect(self):
-        return QtCore.QRectF(0, 0, 2500, 2500)
+        return self.bounds
+
+    def shape(self):
+        # the edge is hit near its line and on its arrow head, not in the whole bounding rect
+        if self.path is None:
+            path = QtGui.QPainterPath()
+            path.moveTo(self.x1, self.y1)
+            path.lineTo(self.x2, self.y2)
+            stroker = QtGui.QPainterPathStroker()
+            stroker.setWidth(6)
+            self.path = stroker.createStroke(path)
+            self.path.addPolygon(self.arrow)
+        return self.path
 
 
 class GraphScene(QtWidgets.QGraphicsScene):
     def __init__(self):
         super().__init__()
         self.movingNode = None
-        self.importing = False
-        self.setSceneRect(0, 0, 2500, 2500)  # set size of graphical scene
+        self.importWorker = None  # ImportWorker reading a file in the background
+        self.setSceneRect(0, 0, 2500, 2500)  # initial size of graphical scene, grows with the items
+        # the items report tight bounds, so the BSP index finds the items under a point or in a region quickly
+        self.setItemIndexMethod(QtWidgets.QGraphicsScene.BspTreeIndex)
         self.nodes = {}  # node dictionary
         self.edges = {}  # edge dictionary
-        self.importNames = []
-        self.bn = gum.BayesNet('Bayesian Net')
+        # incidence index kept in sync with the arcs of the network: node name -> {neighbour name: edge}
+        self.inEdges = {}  # arcs coming from the parents of the node
+        self.outEdges = {}  # arcs going to the children of the node
+        self.model = BayesianModel()  # network, positions and evidence shown by the scene
+        self.model.addObserver(self.modelChanged)
+        # (node name, inference mode index, model version, start time, engine name) of the running inference
+        self.inferenceJob = None
+        self.posteriors = None  # PosteriorStore with the posteriors of all the nodes drawn on the scene
+        self.posteriorsMode = None  # inference mode index of the posteriors drawn on the scene
+        self.posteriorsPending = None  # inference mode index of the posteriors to compute after the running job
+        self.inferenceTimer = QtCore.QTimer()  # polls the inference process and refreshes the elapsed time
+        self.inferenceTimer.setInterval(50)
+        self.inferenceTimer.timeout.connect(self.pollInference)
 
         self.data_updater = UpdateData()  # create a data updater to send out a signal anytime data about the graph is changed
+        self.inference_updater = UpdateInference()  # sends out the status of the running inference
+        self.import_updater = UpdateImport()  # sends out the progress of the import of a file
+        self.batchDepth = 0  # number of nested batch() blocks running
+        self.batchChanged = False  # the graph changed during the running batch
 
         # set up message box for displaying invalid input alerts 
         self.InvalidInMsg = QtWidgets.QMessageBox()
@@ -215,6 +408,19 @@ class GraphScene(QtWidgets.QGraphicsScene):
 
         self.selected = []
 
+    @property
+    def bn(self):
+        return self.model.bn
+
+    @property
+    def evidence(self):
+        return self.model.evidence
+
+    def modelChanged(self, event, nodeName):
+        # the posteriors drawn on the nodes are outdated by any change of the network
+        if event != 'position':
+            self.clearPosteriors()
+
     def check_selected(self, requiredNum):
 
         if len(self.selected) != requiredNum:  # if nodes arent selected print message and cancel
@@ -225,8 +431,28 @@ class GraphScene(QtWidgets.QGraphicsScene):
     def deselect_nodes(self):
         for node in self.selected:
             node.selected = False
+            node.update()  # only the deselected nodes are repainted
         self.selected = []
 
+    @contextlib.contextmanager
+    def batch(self):
+        # edits made in the with block emit a single data_updater signal when the outermost block ends
+        self.batchDepth += 1
+        try:
+            yield
+        finally:
+            self.batchDepth -= 1
+            if self.batchDepth == 0 and self.batchChanged:
+                self.batchChanged = False
+                self.data_updater.signal.emit()
+
+    def graphChanged(self):
+        # notify the main window that the graph was updated, at the end of the batch if one is running
+        if self.batchDepth:
+            self.batchChanged = True
+        else:
+            self.data_updater.signal.emit()
+
     def mousePressEvent(self, event):
 
         if event.button() == QtCore.Qt.RightButton:  # if right button pressed
@@ -241,6 +467,7 @@ class GraphScene(QtWidgets.QGraphicsScene):
                 self.add_node(event)  # otherwise call add node function
                 return
         else:
+            self.model.moveNode(self.movingNode.val, self.movingNode.x, self.movingNode.y)
             self.movingNode = None
         QtWidgets.QGraphicsScene.mouseReleaseEvent(self, event)  # call original function to maintain functionality
 
@@ -252,23 +479,25 @@ class GraphScene(QtWidgets.QGraphicsScene):
                 if type(node) is Node:  # if item is a node
                     self.movingNode = node
             else:
-                # Update node position
-                self.movingNode.x = event.scenePos().x() - 20
-                self.movingNode.y = event.scenePos().y() - 20
+                # Update node position, only the old and the new areas of the node and its arcs are repainted
+                self.movingNode.moveTo(event.scenePos().x() - 20, event.scenePos().y() - 20)
                 # Updates arcs
-                for edgeNode in self.movingNode.parents + self.movingNode.children:
-                    try:
-                        edge = self.edges[(self.movingNode.val, edgeNode)]
-                        edge.x1 = edge.node1.x + 20
-                        edge.y1 = edge.node1.y + 20
-                    except KeyError:
-                        edge = self.edges[(edgeNode, self.movingNode.val)]
-                        edge.x2 = edge.node2.x + 20
-                        edge.y2 = edge.node2.y + 20
-                self.update()
+                for edge in self.incidentEdges(self.movingNode.val):
+                    edge.updatePosition()
+                self.growSceneRect(self.movingNode.boundingRect())
 
         QtWidgets.QGraphicsScene.mouseMoveEvent(self, event)  # call original function to maintain functionality
 
+    def growSceneRect(self, rect):
+        # enlarge the scene so that the view can scroll to the rect, with a margin to grow less often
+        if not self.sceneRect().contains(rect):
+            margin = SCENE_MARGIN
+            self.setSceneRect(self.sceneRect().united(rect.adjusted(-margin, -margin, margin, margin)))
+
+    def incidentEdges(self, nodeName):
+        # edges from the parents and to the children of the node
+        return list(self.inEdges[nodeName].values()) + list(self.outEdges[nodeName].values())
+
     def keyPressEvent(self, event):
 
         if event.key() == QtCore.Qt.Key_Return:  # if enter is pressed
@@ -279,8 +508,8 @@ class GraphScene(QtWidgets.QGraphicsScene):
             self.open_CPT_selected()
         elif event.key() == QtCore.Qt.Key_Delete:  # if delete pressed
             self.delete_edge_selected()  # remove edge between selected nodes
-
-        self.update()
+        elif event.key() == QtCore.Qt.Key_E:  # if E pressed
+            self.edit_evidence_selected()  # set the evidence on the selected node
 
     def open_CPT_selected(self):
         if self.check_selected(1):
@@ -295,25 +524,136 @@ class GraphScene(QtWidgets.QGraphicsScene):
             self.InvalidInMsg.setText('"' + str(nodeName) + '" is not in network')
             self.InvalidInMsg.exec_()  # print message and exit
             return
+        from NodeCPTGui import Ui_CPTWindow  # matplotlib is loaded with the first CPT window, not at startup
         self.CPTWindow = Ui_CPTWindow(self, nodeName)
         self.CPTWindow.show()
 
+    def edit_evidence_selected(self):
+        if self.check_selected(1):
+            self.editEvidence(self.selected[0].val)
+            self.deselect_nodes()
+        else:
+            self.InvalidInMsg.setText('Must select only 1 node to set its evidence')
+            self.InvalidInMsg.exec_()
+
+    def editEvidence(self, nodeName):
+        dialog = EvidenceDialog(self.bn.variable(nodeName), self.evidence.get(nodeName))
+        if dialog.exec_():
+            self.setEvidence(nodeName, dialog.evidence)
+
+    def setEvidence(self, nodeName, evidence):
+        # evidence is the index of the observed state, a list of likelihoods or None to erase it
+        mode = self.posteriorsMode if self.posteriorsPending is None else self.posteriorsPending
+        if self.inferenceJob is not None and self.inferenceJob[0] is None:
+            mode = self.inferenceJob[1]  # The posteriors being computed are already outdated
+        self.model.setEvidence(nodeName, evidence)
+        self.nodes[nodeName].evidence = evidence is not None
+        self.nodes[nodeName].update()
+        # The inference process only posts the changed evidence to its engines, no compilation is needed
+        if mode is not None and self.inferenceJob is None:
+            self.computePosteriors(mode)
+        else:  # Computed again when the running inference ends
+            self.posteriorsPending = mode
+
+    def clearPosteriors(self):
+        self.posteriorsMode = None
+        if self.posteriors is not None:
+            self.posteriors = None
+            for node in self.nodes.values():
+                node.setPosterior(None)
+
     def makeInference(self, nodeName, index):
-        if index == 0:  # Lazy Propagation
-            ie = gum.LazyPropagation(self.bn)
-        elif index == 1:  # Shafer Shenoy
-            ie = gum.ShaferShenoyInference(self.bn)
-        else:  # Variable Elimination
-            ie = gum.VariableElimination(self.bn)
-        ie.makeInference()
+        if self.checkInferenceIdle():
+            engine = self.model.chooseEngine(index)
+            cached = self.model.requestPosterior(nodeName, engine)
+            self.startInference(nodeName, index, engine, cached)
+
+    def computePosteriors(self, index):
+        # a single propagation gives the posteriors of all the nodes, drawn on the scene
+        if self.checkInferenceIdle():
+            engine = self.model.chooseEngine(index)
+            cached = self.model.requestPosteriors(engine)
+            self.startInference(None, index, engine, cached)
+
+    def checkInferenceIdle(self):
+        if self.inferenceJob is not None:
+            self.InvalidInMsg.setText('An inference is already running')
+            self.InvalidInMsg.exec_()
+            return False
+        return True
+
+    def startInference(self, nodeName, index, engine, cached=False):
+        # index is the inference mode, engine the index of the engine it runs: they differ for "Auto"; a cached
+        # result is returned by the first poll
+        name = INFERENCE_NAMES[engine] if engine == index else '{} ({})'.format(INFERENCE_NAMES[index],
+                                                                                 INFERENCE_NAMES[engine])
+        if cached:
+            name += ' from the cache'
+        self.inferenceJob = (nodeName, index, self.model.version, time.perf_counter(), name)
+        self.inferenceTimer.start()
+        self.pollInference()
+
+    def cancelInference(self):
+        if self.inferenceJob is not None:
+            self.model.cancelInference()
+            self.finishInference('Inference cancelled')
+
+    def finishInference(self, message):
+        self.inferenceTimer.stop()
+        self.inferenceJob = None
+        self.inference_updater.signal.emit(message, False)
+        if self.posteriorsPending is not None:  # The evidence changed while the posteriors were computed
+            mode = self.posteriorsPending
+            self.posteriorsPending = None
+            QtCore.QTimer.singleShot(0, lambda: self.computePosteriors(mode))
+
+    def pollInference(self):
+        nodeName, index, version, start, name = self.inferenceJob
+        reply = self.model.pollInference()
+        elapsed = time.perf_counter() - start
+        target = 'all nodes' if nodeName is None else '"' + nodeName + '"'
+        if reply is None:
+            self.inference_updater.signal.emit('{} on {}: {:.1f} s'.format(name, target, elapsed), True)
+            return
+        if reply[0] == 'error':
+            self.finishInference('Inference failed')
+            self.InvalidInMsg.setText(reply[1])
+            self.InvalidInMsg.exec_()  # print message and exit
+            return
+        if reply[0] == 'posteriors':
+            details = formatAccuracy(reply[3])
+        else:  # The posterior of a single node was computed on the pruned network
+            details = ', '.join(text for text in (formatPruning(*reply[5]), formatAccuracy(reply[4])) if text)
+        self.finishInference('{} on {} done in {:.2f} s'.format(name, target, elapsed) +
+                             (', ' + details if details else ''))
+        if reply[0] == 'posteriors':
+            if version == self.model.version:  # Otherwise the network changed while the inference was running
+                self.showPosteriors(reply[1], index)
+            return
+        if nodeName not in self.nodes:  # The node was deleted while the inference was running
+            return
         try:
+            posterior = gum.Potential()
+            posterior.add(self.bn.variable(nodeName))
+            posterior.fillWith(reply[2].flatten().tolist())
             self.CPTWindow.close()
-            self.inferenceWindow = Ui_CPTWindow(self, nodeName, ie.posterior(nodeName))
+            from NodeCPTGui import Ui_CPTWindow
+            self.inferenceWindow = Ui_CPTWindow(self, nodeName, posterior, details)
             self.inferenceWindow.show()
         except Exception as e:
             self.InvalidInMsg.setText(e.__str__())
             self.InvalidInMsg.exec_()  # print message and exit
 
+    def showPosteriors(self, posteriors, index):
+        self.posteriors = posteriors
+        self.posteriorsMode = index
+        for name, node in self.nodes.items():
+            variable = self.bn.variable(name)
+            # the nodes keep views on the array of the store, painting them does not copy or recompute anything
+            # binary range variables are shown as percentages too, a sparkline of two points says nothing
+            node.setPosterior(posteriors.get(name), variable.varType() == RANGE_TYPE and variable.domainSize() > 2,
+                              [variable.label(i) for i in range(variable.domainSize())])
+
     def delete_edge_selected(self):
 
         if self.check_selected(2):  # if nodes selected
@@ -333,8 +673,9 @@ class GraphScene(QtWidgets.QGraphicsScene):
             self.InvalidInMsg.exec_()
 
     def delete_nodes_selected(self):
-        for node in self.selected:  # for each of the selected nodes
-            self.remove_node(node.val)  # remove it from the graph
+        with self.batch():  # a single update for all the nodes
+            for node in self.selected:  # for each of the selected nodes
+                self.remove_node(node.val)  # remove it from the graph
 
         self.selected = []
 
@@ -347,203 +688,260 @@ class GraphScene(QtWidgets.QGraphicsScene):
                 self.selected.append(node)
             else:
                 self.selected.remove(node)
-        self.update()
+            node.update()
 
-    def saveNodesLocation(self, path):
-        file = open(path.replace('.bif', '_LOC.txt'), "w")
-        for var in self.nodes.values():
-            file.write(var.val)
-            file.write(" ")
-            file.write(str(var.x))
-            file.write(" ")
-            file.write(str(var.y))
-            file.write("\n")
-        file.close()
-
-    def importBN(self, file):
+    def importBN(self, file, background=False):
+        # read the file, in a worker thread if background is True, then show the network in one batch
+        if self.importWorker is not None:
+            self.InvalidInMsg.setText("A file is already being imported")
+            self.InvalidInMsg.exec_()
+            return
+        self.import_updater.signal.emit("Reading " + file, 0, 0)
+        if background:
+            self.importWorker = ImportWorker(file)
+            self.importWorker.loaded.connect(
+                lambda bn, positions, storedCPTs: self.finishImport(file, bn, positions, storedCPTs))
+            self.importWorker.failed.connect(self.importFailed)
+            self.importWorker.start()
+            return
         try:
-            self.bn = gum.loadBN(file)
-            self.importing = True
-            self.nodes = {}
-            self.edges = {}
-            self.clear()
-            node_LOC = file.replace(".bif", "_LOC.txt")
-            try:  # Try to import nodes from file _LOC
-                with open(node_LOC, "r") as loc:
-                    nodes = loc.readlines()
-                for node in nodes:
-                    self.add_node(None, node.split())
-                self.importArcs()
-            except FileNotFoundError:  # Import only names, user will choose the positions of nodes
-                for var in self.bn.names():
-                    self.importNames.append(var)
-                self.importNames.reverse()  # Reversing the list in order to start importing from the first node
-                self.InvalidInMsg.setText("Click the point where to draw the node '" + self.importNames[-1] + "'")
-                self.InvalidInMsg.exec_()  # print message and exit
-        except gum.IOError:
-            self.InvalidInMsg.setText("File not found")
-            self.InvalidInMsg.exec_()  # print message and exit
-        except gum.FatalError as e:
-            self.InvalidInMsg.setText("File is not valid:\n{}".format(e))
-            self.InvalidInMsg.exec_()  # print message and exit
-
-    def importArcs(self):
-        for arc in self.bn.arcs():
-            self.add_edge(self.bn.variable(int(arc[0])).name(), self.bn.variable(int(arc[1])).name())
-        self.importing = False
-
-    def add_node(self, event, import_node=None):
-        if import_node is None:
-            x = event.scenePos().x()  # get x position of mouse
-            y = event.scenePos().y()  # get y position of mouse
-        else:  # Import positions from file _LOC
-            x = float(import_node[1])
-            y = float(import_node[2])
-        if not self.importing:
-            node_val, ok = QtWidgets.QInputDialog.getText(QtWidgets.QWidget(), 'Input Dialog',
-                                                          'Enter node name:')  # use dialog to get node value to be added
-            if node_val:  # In case user didn't want to create a node, he can just not type the name
-                if node_val not in self.nodes:
-                    variable_type, ok = QInputDialog.getItem(QtWidgets.QWidget(), "Select node type",
-                                                             "Type:", ["LabelizedVariable", "RangeVariable"], 0, False)
-                    if variable_type == "RangeVariable":
-                        inputter = InputDialog()
-                        inputter.exec_()
-                        minVal = inputter.spinBoxes[0].value()
-                        maxVal = inputter.spinBoxes[1].value()
-                else:
-                    self.InvalidInMsg.setText('Node already present')
-                    self.InvalidInMsg.exec_()
-                    return
-        elif import_node is not None:  # Import the name from the file
-            node_val = import_node[0]
-        else:  # Import name from previous populated list
-            node_val = self.importNames.pop()
-        if node_val:  # dialog value was input
-            if 10 > len(str(node_val)) > 0:  # if input was between 1 and 10 characters
-                node = Node(x - 20, y - 20, str(node_val))  # create a new node at the given x and y coordinates
-                self.addItem(node)  # add node to scene
-                self.nodes[node.val] = node  # add node to node dictionary
-                if not self.importing:
-                    if variable_type == "RangeVariable":
-                        var = gum.RangeVariable(node_val, "", minVal, maxVal)
-                        potential = []
-                        for i in range(var.domainSize()):
-                            potential.append(0.5)
-                    else:
-                        var = gum.LabelizedVariable(node.val, "", 2)
-                        potential = [0.5, 0.5]
-                    self.bn.add(var)
-                    self.bn.cpt(node.val).fillWith(potential)
-            else:
-                self.InvalidInMsg.setText(
-                    'Node name must consist of between 1 and 10 characters')  # print message if invalid dialog input
-                self.InvalidInMsg.exec_()
-                return
-            self.data_updater.signal.emit()  # emit a signal to notify that the graph was updated
-            if self.importing and import_node is None:  # If importing without file
-                if self.importNames:  # Import next node
-                    self.InvalidInMsg.setText("Click the point where to draw the node '" + self.importNames[-1] + "'")
-                    self.InvalidInMsg.exec_()  # print message and exit
-                else:  # If nodes are imported, import arcs
-                    self.importArcs()
+            bn, positions, storedCPTs = readNetwork(file)
+        except (gum.IOError, FileNotFoundError):
+            self.importFailed("File not found")
+            return
+        except (gum.FatalError, ValueError) as e:
+            self.importFailed("File is not valid:\n{}".format(e))
+            return
+        self.finishImport(file, bn, positions, storedCPTs)
+
+    def importFailed(self, message):
+        self.importWorker = None
+        self.import_updater.signal.emit("", 0, 0)
+        self.InvalidInMsg.setText(message)
+        self.InvalidInMsg.exec_()  # print message and exit
+
+    def finishImport(self, file, bn, positions, storedCPTs=None):
+        self.importWorker = None
+        self.model.setNetwork(bn, positions, storedCPTs, file)
+        if self.model.unplacedNodes():  # No position in the file for some nodes, they are laid out
+            self.import_updater.signal.emit("Placing the nodes", 0, 0)
+            self.model.layoutNodes()
+            try:
+                if not isProject(file):  # A project file is only written when it is saved
+                    self.model.saveNodesLocation(file)  # The next import finds the positions
+            except OSError:  # The network is still shown when its folder cannot be written
+                pass
+        self.buildItems()
+        self.import_updater.signal.emit("", 0, 0)
+        self.graphChanged()  # a single update once the whole network is shown
+
+    def buildItems(self):
+        # replace the items of the scene by the nodes and the arcs of the model, created in one batch without the
+        # checks and the signals of add_node and add_edge
+        self.nodes = {}
+        self.edges = {}
+        self.inEdges = {}
+        self.outEdges = {}
+        self.selected = []
+        self.movingNode = None
+        self.clear()
+        arcs = self.model.arcs()
+        total = len(self.model.positions) + len(arcs)
+        # the BSP index is built once with all the items instead of being updated by every new item
+        self.setItemIndexMethod(QtWidgets.QGraphicsScene.NoIndex)
+        for done, (name, (x, y)) in enumerate(self.model.positions.items()):
+            if done % PROGRESS_STEP == 0:
+                self.import_updater.signal.emit("Creating the nodes", done, total)
+            self.createNode(name, x, y)
+        for done, (tail, head) in enumerate(arcs, len(self.nodes)):
+            if done % PROGRESS_STEP == 0:
+                self.import_updater.signal.emit("Creating the arcs", done, total)
+            self.createEdge(tail, head)
+        self.setItemIndexMethod(QtWidgets.QGraphicsScene.BspTreeIndex)
+        self.setSceneRect(0, 0, 2500, 2500)
+        self.growSceneRect(self.itemsBoundingRect())
+
+    def createNode(self, name, x, y):
+        # item of a node of the model, (x, y) is its top left corner
+        node = Node(x, y, str(name))
+        node.evidence = name in self.evidence
+        self.addItem(node)  # add node to scene
+        self.nodes[node.val] = node  # add node to node dictionary
+        self.inEdges[node.val] = {}
+        self.outEdges[node.val] = {}
+        return node
+
+    def createEdge(self, tail, head):
+        # item of an arc of the model
+        edge = Edge(self.nodes[tail], self.nodes[head])
+        self.addItem(edge)  # add edge to scene
+        self.edges[(tail, head)] = edge  # add new edge to list of edges
+        self.outEdges[tail][head] = edge
+        self.inEdges[head][tail] = edge
+        return edge
+
+    def add_node(self, event):
+        x = event.scenePos().x()  # get x position of mouse
+        y = event.scenePos().y()  # get y position of mouse
+        bounds = None
+        node_val, ok = QtWidgets.QInputDialog.getText(QtWidgets.QWidget(), 'Input Dialog',
+                                                      'Enter node name:')  # use dialog to get node value to be added
+        if not node_val:  # In case user didn't want to create a node, he can just not type the name
+            return
+        try:
+            self.model.checkName(node_val)
+        except ValueError as e:
+            self.InvalidInMsg.setText(str(e))
+            self.InvalidInMsg.exec_()
+            return
+        variable_type, ok = QInputDialog.getItem(QtWidgets.QWidget(), "Select node type",
+                                                 "Type:", ["LabelizedVariable", "RangeVariable"], 0, False)
+        if variable_type == "RangeVariable":
+            inputter = InputDialog()
+            inputter.exec_()
+            bounds = (inputter.spinBoxes[0].value(), inputter.spinBoxes[1].value())
+        self.model.addNode(node_val, x - 20, y - 20, bounds)
+        node = self.createNode(node_val, x - 20, y - 20)  # create a new node at the given x and y coordinates
+        self.growSceneRect(node.boundingRect())
+        self.graphChanged()  # emit a signal to notify that the graph was updated
 
     def add_edge(self, node1_val, node2_val):
-        if node1_val not in self.nodes:  # ensure node value is in dictionary of nodes
-            self.InvalidInMsg.setText('"' + str(node1_val) + '" is not in network')
-            self.InvalidInMsg.exec_()
-            return False
-        if node2_val not in self.nodes:  # ensure node value is in dictionary of nodes
-            self.InvalidInMsg.setText('"' + str(node2_val) + '" is not in network')
-            self.InvalidInMsg.exec_()
-            return False
-        if node2_val == node1_val:  # ensure node values are unique
-            self.InvalidInMsg.setText('Two unique node values required to create an arc')
-            self.InvalidInMsg.exec_()
-            return False
-        # get nodes from dictionary
-        node2 = self.nodes[node2_val]
-        node1 = self.nodes[node1_val]
-        if (node1_val, node2_val) in self.edges or ((node2_val,
-                                                     node1_val) in self.edges):  # if edge already exists between given nodes
-            self.InvalidInMsg.setText('Arc already present between the two nodes')
+        try:
+            self.model.addArc(node1_val, node2_val)
+        except ValueError as e:
+            self.InvalidInMsg.setText(str(e))
             self.InvalidInMsg.exec_()
             return False
-        edge = Edge(node1, node2)  # create new edge
-        self.addItem(edge)  # add edge to scene
-        if not self.importing:
-            self.bn.addArc(node1.val, node2.val)
-        node1.children.append(node2_val)
-        node2.parents.append(node1_val)
-        # reset all nodes in graph so they are layered over the edges
-        for val, node in self.nodes.items():
-            self.removeItem(node)
-            self.addItem(node)
-
-        self.edges[(node1_val, node2_val)] = edge  # add new edge to list of edges
-        self.data_updater.signal.emit()  # emit a signal to notify that the graph was updated
+        self.createEdge(node1_val, node2_val)
+        self.graphChanged()  # emit a signal to notify that the graph was updated
         return True  # return true if edge successfully added
 
     def remove_edge(self, node1_val, node2_val):
-
-        if node1_val not in self.nodes:  # if node1_val not in nodes dictinary
-            self.InvalidInMsg.setText('"' + str(node1_val) + '" is not in network')
-            self.InvalidInMsg.exec_()  # print message and exit
-            return
-
-        if node2_val not in self.nodes:  # if node1_val not in nodes dictinary
-            self.InvalidInMsg.setText('"' + str(node2_val) + '" is not in network')
-            self.InvalidInMsg.exec_()  # print message and exit
-            return
-
-        if (node1_val, node2_val) not in self.edges:  # if edge from node1_val to node2_val not in edges dictionary
-            self.InvalidInMsg.setText('No edge exists between nodes ' + str(node1_val) + ' and ' + str(node2_val))
+        try:
+            self.model.removeArc(node1_val, node2_val)
+        except ValueError as e:
+            self.InvalidInMsg.setText(str(e))
             self.InvalidInMsg.exec_()  # print message and exit
             return
-        else:
-            edge = self.edges[(node1_val, node2_val)]  # otherwise represent edge from node1_val, node2_val
+        self.remove_edge_item(node1_val, node2_val)
+        self.graphChanged()  # emit a signal to notify that the graph was updated
 
+    def remove_edge_item(self, node1_val, node2_val):
+        edge = self.edges.pop((node1_val, node2_val))  # delete edge from edges dictionary
         self.removeItem(edge)  # remove edge from scene
-        # self.graph.remove_edge(node1_val, node2_val)  # remove edge from underlaying graph
-        self.bn.eraseArc(node1_val, node2_val)
-        self.nodes[node1_val].children.remove(node2_val)
-        self.nodes[node2_val].parents.remove(node1_val)
-        del self.edges[(edge.node1.val, edge.node2.val)]  # delete edge from edges dictionary
-
-        self.data_updater.signal.emit()  # emit a signal to notify that the graph was updated
+        del self.outEdges[node1_val][node2_val]
+        del self.inEdges[node2_val][node1_val]
 
     def remove_node(self, node_val):
-        if node_val not in self.nodes:  # if node value not in dictionary
-            self.InvalidInMsg.setText(str(node_val) + ' is not in graph')
+        try:
+            connections = self.model.removeNode(node_val)
+        except ValueError as e:
+            self.InvalidInMsg.setText(str(e))
             self.InvalidInMsg.exec_()  # print message and exit
             return
-        connections = []
-        for node_pair in self.edges.keys():  # for each edge in graph
-            if node_pair[0] == node_val or node_pair[1] == node_val:  # if edge connects to this node
-                connections.append(
-                    (node_pair[0], node_pair[1]))  # save the connection in list
-        for connection in connections:  # for all connections
-            self.remove_edge(connection[0], connection[1])  # remove edges from graph
+        # remove the edges of the node from the graph, found in the incidence index without scanning the others
+        for parent, edge in self.inEdges.pop(node_val).items():
+            del self.edges[(parent, node_val)]
+            del self.outEdges[parent][node_val]
+            self.removeItem(edge)
+        for child, edge in self.outEdges.pop(node_val).items():
+            del self.edges[(node_val, child)]
+            del self.inEdges[child][node_val]
+            self.removeItem(edge)
         self.removeItem(self.nodes[node_val])  # remove the node from the scene
-        # self.graph.remove_node(node_val)  # remove the node from the underlaying graph
-        self.bn.erase(node_val)
         del self.nodes[node_val]  # delete the node from the node dictionary
 
-        self.data_updater.signal.emit()  # emit a signal to notify that the graph was updated
+        self.graphChanged()  # emit a signal to notify that the graph was updated
         return connections  # return the connections that were deleted
 
     def overlay_highlighted(self):
         for (from_node_val, to_node_val), edge in self.edges.items():
-            if edge.highlighted:
-                self.removeItem(edge)
-                self.addItem(edge)  # layer highlighted edges over none highlighted edges
+            # layer highlighted edges over none highlighted edges, the nodes stay over both
+            edge.setZValue(HIGHLIGHTED_EDGE_Z if edge.highlighted else EDGE_Z)
+
+
+class GraphView(QtWidgets.QGraphicsView):
+    # view of the graph scene: the wheel zooms around the mouse, the middle button pans and Home fits the graph
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.panStart = None  # position of the mouse in the viewport while panning
+        self.setTransformationAnchor(QtWidgets.QGraphicsView.AnchorUnderMouse)
+        self.setViewportUpdateMode(QtWidgets.QGraphicsView.SmartViewportUpdate)
+
+    def zoom(self, factor):
+        scale = self.transform().m11()
+        factor = min(max(scale * factor, ZOOM_RANGE[0]), ZOOM_RANGE[1]) / scale
+        self.scale(factor, factor)
+
+    def zoomToFit(self):
+        if self.scene() is not None and self.scene().items():
+            self.fitInView(self.scene().itemsBoundingRect(), QtCore.Qt.KeepAspectRatio)
+            self.zoom(min(1.0, 1 / self.transform().m11()))  # Small graphs keep their size
+
+    def wheelEvent(self, event):
+        self.zoom(1.0015 ** event.angleDelta().y())  # One step of the wheel (120) zooms by 20 %
+
+    def mousePressEvent(self, event):
+        if event.button() == QtCore.Qt.MiddleButton:
+            self.panStart = event.pos()
+            self.viewport().setCursor(QtCore.Qt.ClosedHandCursor)
+            return
+        QtWidgets.QGraphicsView.mousePressEvent(self, event)
+
+    def mouseMoveEvent(self, event):
+        if self.panStart is not None:
+            delta = event.pos() - self.panStart
+            self.panStart = event.pos()
+            self.horizontalScrollBar().setValue(self.horizontalScrollBar().value() - delta.x())
+            self.verticalScrollBar().setValue(self.verticalScrollBar().value() - delta.y())
+            return
+        QtWidgets.QGraphicsView.mouseMoveEvent(self, event)
+
+    def mouseReleaseEvent(self, event):
+        if event.button() == QtCore.Qt.MiddleButton and self.panStart is not None:
+            self.panStart = None
+            self.viewport().unsetCursor()
+            return
+        QtWidgets.QGraphicsView.mouseReleaseEvent(self, event)
 
-        for node_val, node in self.nodes.items():
-            # layer all nodes over edges
-            self.removeItem(node)
-            self.addItem(node)
+    def keyPressEvent(self, event):
+        if event.key() == QtCore.Qt.Key_Home:
+            self.zoomToFit()
+            return
+        QtWidgets.QGraphicsView.keyPressEvent(self, event)
 
 
 class UpdateData(QtCore.QObject):
     # class for signaling main window of updated data
     signal = QtCore.pyqtSignal()
+
+
+class UpdateImport(QtCore.QObject):
+    # class for signaling main window of the progress of an import: message, items created and items to create,
+    # 0 items to create while the progress is unknown and an empty message once the import is over
+    signal = QtCore.pyqtSignal(str, int, int)
+
+
+class ImportWorker(QtCore.QThread):
+    # thread reading a BIF file and its _LOC.txt file, so the GUI can still repaint while a large file is parsed
+    loaded = QtCore.pyqtSignal(object, object, object)  # network, positions and memory-mapped CPTs
+    failed = QtCore.pyqtSignal(str)
+
+    def __init__(self, path):
+        super().__init__()
+        self.path = path
+
+    def run(self):
+        try:
+            bn, positions, storedCPTs = readNetwork(self.path)
+        except (gum.IOError, FileNotFoundError):
+            self.failed.emit("File not found")
+        except (gum.FatalError, ValueError) as e:
+            self.failed.emit("File is not valid:\n{}".format(e))
+        else:
+            self.loaded.emit(bn, positions, storedCPTs)
+
+
+class UpdateInference(QtCore.QObject):
+    # class for signaling main window of the inference status: message and whether it is still running
+    signal = QtCore.pyqtSignal(str, bool)
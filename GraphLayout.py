@@ -0,0 +1,159 @@
+import math
+
+import numpy as np
+
+''' Graph Layout
+
+    Description:
+        This file contains the automatic placement of the nodes of a network imported without positions. Directed
+        acyclic graphs get a layered (Sugiyama) layout: every node is one layer below its lowest parent, the order
+        of the nodes in each layer is improved with barycenter sweeps to reduce the crossings of the arcs, and the
+        layers too long to be shown are wrapped on several rows. Other graphs get a force-directed layout where the
+        nodes repel each other and the arcs pull their ends together. Both work on NumPy arrays of all the nodes at
+        once, so thousands of nodes are placed in seconds. The positions returned are the top left corners of the
+        nodes, as stored in the _LOC.txt files.
+
+'''
+
+SPACING = (80, 100)  # horizontal and vertical distance between the nodes
+SWEEPS = 8  # barycenter sweeps of the layered layout, alternately down and up the layers
+ITERATIONS = 60  # steps of the force-directed layout
+GRID = 256  # largest number of cells on a side of the grid used to compute the repulsion of the nodes
+
+
+def layout(names, arcs, method=None):
+    # name -> (x, y) of every node: layered layout for a DAG or with method 'layered', force-directed otherwise
+    names = list(names)
+    if not names:
+        return {}
+    index = {name: i for i, name in enumerate(names)}
+    tails = np.array([index[tail] for tail, head in arcs], dtype=int)
+    heads = np.array([index[head] for tail, head in arcs], dtype=int)
+    layers = None
+    if method != 'force':
+        layers = layerNodes(len(names), tails, heads)
+    if layers is None:
+        if method == 'layered':
+            raise ValueError('The layered layout needs a graph without cycle')
+        positions = forceLayout(len(names), tails, heads)
+    else:
+        positions = layeredLayout(layers, tails, heads)
+    positions -= positions.min(axis=0)  # Start at the top left corner of the scene
+    return {name: (float(x), float(y)) for name, (x, y) in zip(names, positions)}
+
+
+def layerNodes(count, tails, heads):
+    # layer of every node, one more than the deepest of its parents, or None if the graph has a cycle
+    children = [[] for _ in range(count)]
+    for tail, head in zip(tails.tolist(), heads.tolist()):
+        children[tail].append(head)
+    remaining = np.bincount(heads, minlength=count)  # parents not yet layered
+    layers = np.zeros(count, dtype=int)
+    ready = [node for node in range(count) if remaining[node] == 0]
+    done = 0
+    while ready:
+        node = ready.pop()
+        done += 1
+        for child in children[node]:
+            layers[child] = max(layers[child], layers[node] + 1)
+            remaining[child] -= 1
+            if remaining[child] == 0:
+                ready.append(child)
+    return layers if done == count else None
+
+
+def rank(layers, keys, ties):
+    # position of every node in its layer once the layer is sorted by keys, then by ties
+    order = np.lexsort((ties, keys, layers))
+    starts = np.searchsorted(layers[order], layers[order])  # index of the first node of the layer in the order
+    ranks = np.empty(len(layers))
+    ranks[order] = np.arange(len(layers)) - starts
+    return ranks
+
+
+def layeredLayout(layers, tails, heads):
+    count = len(layers)
+    sizes = np.bincount(layers)
+    ranks = rank(layers, np.zeros(count), np.arange(count))
+    for sweep in range(SWEEPS):
+        # move every node to the mean position of its neighbours in the layers above, then below, centering the
+        # layers so that layers of different lengths are compared on the same axis
+        centered = ranks - (sizes[layers] - 1) / 2.0
+        sources, targets = (tails, heads) if sweep % 2 == 0 else (heads, tails)
+        total = np.bincount(targets, weights=centered[sources], minlength=count)
+        degree = np.bincount(targets, minlength=count)
+        barycenters = np.where(degree > 0, total / np.maximum(degree, 1), centered)
+        ranks = rank(layers, barycenters, ranks)  # Ties keep their previous order
+    # wrap the long layers on several rows so that the graph is not much wider than high
+    rowLength = max(10, int(2 * math.sqrt(count)))
+    rows = ranks // rowLength
+    rowsPerLayer = np.ceil(sizes / float(rowLength)).astype(int)
+    firstRow = np.concatenate(([0], np.cumsum(rowsPerLayer)[:-1]))
+    columns = ranks - rows * rowLength
+    rowSizes = np.minimum(sizes[layers] - rows * rowLength, rowLength)
+    x = (columns - (rowSizes - 1) / 2.0) * SPACING[0]
+    y = (firstRow[layers] + rows) * SPACING[1]
+    return np.column_stack((x, y))
+
+
+def forceLayout(count, tails, heads, seed=0):
+    # Fruchterman-Reingold: repulsion k^2/d between all the nodes, attraction d^2/k along the arcs, the moves are
+    # limited by a temperature that decreases at every step
+    k = float(SPACING[0])
+    side = math.ceil(math.sqrt(count))
+    rng = np.random.RandomState(seed)
+    positions = np.column_stack((np.arange(count) % side, np.arange(count) // side)) * k
+    positions = positions + rng.uniform(-k / 4, k / 4, positions.shape)  # Break the symmetry of the grid
+    for step in range(ITERATIONS):
+        temperature = side * k / 10.0 * (1 - step / float(ITERATIONS))
+        displacement = repulsion(positions, k)
+        delta = positions[tails] - positions[heads]
+        pull = delta * (np.sqrt((delta ** 2).sum(axis=1)) / k)[:, np.newaxis]
+        np.add.at(displacement, tails, -pull)
+        np.add.at(displacement, heads, pull)
+        length = np.maximum(np.sqrt((displacement ** 2).sum(axis=1)), 1e-9)
+        positions += displacement * (np.minimum(length, temperature) / length)[:, np.newaxis]
+    return spread(positions, k)
+
+
+def repulsion(positions, k):
+    # repulsion of every node by all the others, computed on a grid instead of for every pair: the number of nodes
+    # in each cell is convolved by FFT with the force k^2/d of one node, so the cost grows with the number of cells
+    cell = max(k, np.ptp(positions, axis=0).max() / GRID)
+    origin = positions.min(axis=0)
+    cells = np.floor((positions - origin) / cell).astype(int)
+    shape = cells.max(axis=0) + 1
+    density = np.zeros(2 * shape)  # Padded so that the convolution does not wrap around
+    np.add.at(density, (cells[:, 0], cells[:, 1]), 1)
+    # force of one node on the cells at every offset, the negative offsets at the end of the axes as the FFT expects
+    offsets = [np.fft.fftfreq(2 * size, 1.0 / (2 * size)) * cell for size in shape]
+    dx, dy = np.meshgrid(offsets[0], offsets[1], indexing='ij')
+    distance2 = dx ** 2 + dy ** 2
+    distance2[0, 0] = np.inf  # No force of a node on its own cell
+    spectrum = np.fft.rfft2(density)
+    size = density.shape
+    forceX = np.fft.irfft2(spectrum * np.fft.rfft2(k * k * dx / distance2), size)
+    forceY = np.fft.irfft2(spectrum * np.fft.rfft2(k * k * dy / distance2), size)
+    return np.column_stack((forceX[cells[:, 0], cells[:, 1]], forceY[cells[:, 0], cells[:, 1]]))
+
+
+def spread(positions, k):
+    # move every node to the nearest free cell of a grid of size k, in the order of their distance to the center,
+    # so that no two nodes overlap
+    cells = np.round(positions / k).astype(int)
+    center = np.median(cells, axis=0)
+    occupied = set()
+    placed = np.empty_like(cells)
+    for node in np.argsort(((cells - center) ** 2).sum(axis=1)):
+        x, y = cells[node]
+        radius = 0
+        while True:
+            free = [(x + i, y + j) for i in range(-radius, radius + 1) for j in range(-radius, radius + 1)
+                    if max(abs(i), abs(j)) == radius and (x + i, y + j) not in occupied]
+            if free:
+                cell = min(free, key=lambda c: (c[0] - x) ** 2 + (c[1] - y) ** 2)
+                break
+            radius += 1
+        occupied.add(cell)
+        placed[node] = cell
+    return placed * np.array(SPACING, dtype=float)
@@ -0,0 +1,248 @@
+import multiprocessing
+import os
+import threading
+import time
+
+import pyAgrum as gum
+
+from InferenceServer import INFERENCE_ENGINES
+
+''' Inference Cost
+
+    Description:
+        This file contains the estimation of the cost of an exact inference on the network. The network is
+        moralized and triangulated by pyAgrum, and the cliques of the junction tree give the treewidth, the number
+        of cells of the largest clique and the memory taken by the potentials of the cliques and by the messages
+        on the separators. The elimination heuristic of pyAgrum is given the moral graph alone, so it weighs every
+        variable the same; the cells are counted with the real domain sizes.
+        Every connected component is triangulated on its own and its estimate is kept, so an edit only
+        triangulates again the component of the edited nodes. pyAgrum holds the GIL while it triangulates, which
+        takes minutes on a dense network, so the triangulation runs in a separate process. It starts once the arcs
+        have not been edited for a moment, and an edit made while it runs stops it and starts it again.
+        The "Auto" inference mode uses the estimate to choose between an exact and an approximate engine. While
+        the estimate of a large network is being computed, it chooses the approximate engine instead of waiting;
+        a small network is triangulated at once.
+
+'''
+
+CELL_BYTES = 8  # every cell of a potential is a double
+EXACT_ENGINE = INFERENCE_ENGINES.index(gum.LazyPropagation)  # chosen by "Auto" when the junction tree fits
+APPROXIMATE_ENGINE = INFERENCE_ENGINES.index(gum.LoopyBeliefPropagation)  # chosen by "Auto" otherwise
+SYNC_ESTIMATE_SIZE = 1000  # nodes and arcs of a network "Auto" triangulates at once, in about a tenth of a second
+ESTIMATE_DELAY = 0.5  # seconds without structural edit before the estimation process is sent the network
+
+
+def memoryLimit():
+    # largest junction tree given to an exact engine: half of the physical memory, 1 GiB where it is unknown
+    try:
+        return os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES') // 2
+    except (AttributeError, ValueError, OSError):
+        return 2 ** 30
+
+
+def chooseEngine(estimate):
+    # the approximate engine when the size of the junction tree is not known
+    if estimate is None:
+        return APPROXIMATE_ENGINE
+    return EXACT_ENGINE if estimate["totalBytes"] <= memoryLimit() else APPROXIMATE_ENGINE
+
+
+def cellCount(sizes, nodes):
+    # Python integers, the cliques of a dense network overflow 64 bits
+    count = 1
+    for node in nodes:
+        count *= sizes[node]
+    return count
+
+
+def components(names, arcs):
+    # connected components of the network, as lists of node names
+    root = {name: name for name in names}
+
+    def find(name):
+        while root[name] != name:
+            root[name] = root[root[name]]
+            name = root[name]
+        return name
+
+    for tail, head in arcs:
+        root[find(tail)] = find(head)
+    groups = {}
+    for name in names:
+        groups.setdefault(find(name), []).append(name)
+    return list(groups.values())
+
+
+def triangulate(domainSizes, arcs):
+    # (treewidth, cells of the largest clique, cells of the cliques and of the messages of the separators) of a
+    # connected component, domainSizes maps its node names to their number of states
+    names = list(domainSizes)
+    ids = {name: i for i, name in enumerate(names)}
+    parents = {name: [] for name in names}
+    for tail, head in arcs:
+        parents[head].append(ids[tail])
+    graph = gum.UndiGraph()
+    for i in range(len(names)):
+        graph.addNodeWithId(i)
+    for name, family in parents.items():
+        child = ids[name]
+        for k, parent in enumerate(family):
+            graph.addEdge(parent, child)
+            for other in family[k + 1:]:
+                graph.addEdge(parent, other)  # The parents of a node are married
+    tree = gum.JunctionTreeGenerator().junctionTree(graph)
+    sizes = [domainSizes[name] for name in names]
+    cliques = [tree.clique(clique) for clique in tree.nodes()]
+    cliqueCells = [cellCount(sizes, clique) for clique in cliques]
+    # a message in each direction on every separator
+    separatorCells = sum(2 * cellCount(sizes, tree.separator(a, b)) for a, b in tree.edges())
+    return max(len(clique) for clique in cliques) - 1, max(cliqueCells), sum(cliqueCells) + separatorCells
+
+
+def estimateNetwork(domainSizes, arcs, dirty=(), known=None):
+    # estimate of the network and of each of its components (node names -> triangulate result); the components
+    # in known that contain no dirty node are not triangulated again
+    known = known or {}
+    componentOf = {}
+    estimates = {}
+    for component in components(domainSizes, arcs):
+        key = frozenset(component)
+        for name in component:
+            componentOf[name] = key
+    componentArcs = {key: [] for key in set(componentOf.values())}
+    for tail, head in arcs:
+        componentArcs[componentOf[head]].append((tail, head))
+    for key, keyArcs in componentArcs.items():
+        if key in known and key.isdisjoint(dirty):
+            estimates[key] = known[key]
+        else:
+            estimates[key] = triangulate({name: domainSizes[name] for name in key}, keyArcs)
+    values = list(estimates.values()) or [(0, 0, 0)]
+    estimate = {"treewidth": max(value[0] for value in values),
+                "largestCells": max(value[1] for value in values),
+                "totalCells": sum(value[2] for value in values),
+                "components": len(estimates)}
+    estimate["largestBytes"] = estimate["largestCells"] * CELL_BYTES
+    estimate["totalBytes"] = estimate["totalCells"] * CELL_BYTES
+    return estimate, estimates
+
+
+def serve(connection):
+    # main loop of the estimation process: a reply for every request, None if the estimate failed
+    while True:
+        try:
+            request = connection.recv()
+        except EOFError:  # The GUI has closed its end of the pipe
+            return
+        try:
+            reply = estimateNetwork(*request)
+        except Exception:
+            reply = None
+        connection.send(reply)
+
+
+def sendRequest(connection, request):
+    # run by a thread: a process just started reads the request only once it has imported pyAgrum
+    try:
+        connection.send(request)
+    except (OSError, ValueError):  # The process was stopped by a newer edit
+        pass
+
+
+class CostEstimator:
+    def __init__(self, model):
+        self.model = model
+        self.estimate = None  # estimate of the network as it was when it was last computed, None if it failed
+        self.components = {}  # frozenset of node names -> estimate of the connected component
+        self.dirtyNodes = set()  # nodes whose arcs changed since the last computation
+        self.changed = True  # the structure changed since the last computation
+        self.lastChange = time.monotonic()  # time of the last change of the structure
+        self.generation = 0  # incremented when a new network is loaded, the components of the previous one are dropped
+        self.process = None  # process triangulating the network, started by the first estimate
+        self.connection = None
+        self.pending = None  # (generation, dirty nodes) of the request being computed, None when the process is idle
+        model.addObserver(lambda event, nodeName: self.modelChanged(event, nodeName))
+
+    def modelChanged(self, event, nodeName):
+        if event == 'network':
+            self.generation += 1
+            self.components = {}
+            self.dirtyNodes = set()
+            self.changed = True
+            self.lastChange = time.monotonic()
+        elif event == 'structure':
+            # the components whose node set changed are new, the others are found through the edited node
+            self.dirtyNodes.add(nodeName)
+            self.changed = True
+            self.lastChange = time.monotonic()
+
+    def snapshot(self):
+        # the structure of the network, with the components already estimated
+        bn = self.model.bn
+        domainSizes = {bn.variable(node).name(): bn.variable(node).domainSize() for node in bn.nodes()}
+        request = (domainSizes, self.model.arcs(), self.dirtyNodes, self.components)
+        self.dirtyNodes = set()
+        self.changed = False
+        return request
+
+    def start(self):
+        # send the network to the estimation process, started first if it is not running
+        if self.process is None:
+            # spawn, so that the child does not inherit the state of the Qt application
+            context = multiprocessing.get_context('spawn')
+            self.connection, childConnection = context.Pipe()
+            self.process = context.Process(target=serve, args=(childConnection,), daemon=True)
+            self.process.start()
+            childConnection.close()
+        request = self.snapshot()
+        self.pending = (self.generation, request[2])
+        threading.Thread(target=sendRequest, args=(self.connection, request), daemon=True).start()
+
+    def stop(self):
+        # kill the process, the nodes of its request are triangulated again by the next estimate
+        self.process.terminate()
+        self.process = None
+        self.connection = None  # Closed once the thread sending to it has given up
+        generation, dirty = self.pending
+        self.pending = None
+        if generation == self.generation:
+            self.dirtyNodes |= dirty
+
+    def poll(self):
+        # called regularly by the GUI: return the estimate once it has been computed again, None otherwise
+        estimate = None
+        if self.pending is not None:
+            try:
+                ready = self.connection.poll()
+                reply = self.connection.recv() if ready else None
+                alive = ready or self.process.is_alive()
+            except (EOFError, OSError):
+                ready, reply, alive = False, None, False
+            if not alive or (ready and reply is None):  # Out of memory most likely, "Auto" goes on without it
+                self.stop()
+                self.estimate = None
+            elif ready:
+                generation = self.pending[0]
+                self.pending = None
+                if generation == self.generation:
+                    self.estimate, self.components = reply
+                    estimate = self.estimate
+        if self.changed and self.pending is not None:  # The estimate being computed is outdated by an edit
+            self.stop()
+        if self.changed and time.monotonic() - self.lastChange >= ESTIMATE_DELAY:
+            self.start()
+        return estimate
+
+    def current(self):
+        # estimate of the network as it is now, None if it is not known yet: a small network is triangulated on
+        # the calling thread, a large one is left to the estimation process
+        self.poll()
+        if not self.changed and self.pending is None:
+            return self.estimate
+        if self.model.bn.size() + self.model.bn.sizeArcs() > SYNC_ESTIMATE_SIZE:
+            return None
+        if self.pending is not None:
+            self.stop()
+        domainSizes, arcs, dirty, known = self.snapshot()
+        self.estimate, self.components = estimateNetwork(domainSizes, arcs, dirty, known)
+        return self.estimate
@@ -0,0 +1,263 @@
+import multiprocessing
+import time
+
+import numpy as np
+import pyAgrum as gum
+
+import Relevance
+from JunctionTreeInference import OrderedJunctionTree
+
+''' Inference Server
+
+    Description:
+        This file contains the process that runs inference away from the GUI. pyAgrum holds the GIL while it
+        propagates, so the inference runs in a separate process that keeps a snapshot of the network and a cache
+        of inference engines built on it. The GUI sends the snapshot when the structure changes, the edited CPTs
+        when only the potentials change, and then asks for posteriors.
+        The exact engines compile the network and are kept from one query to the next. The approximate engines
+        (sampling and loopy belief propagation) work on networks too dense for a junction tree; they stop at the
+        first of the criteria of the query (time, epsilon, number of iterations) and report the error reached.
+        The posterior of a single node is computed on the network pruned by Relevance to the CPTs and the evidence
+        it depends on; the pruned network and its engines are kept while the next queries need the same nodes.
+
+'''
+
+# Inference engines selectable from the CPT window and the main window, in the same order as INFERENCE_NAMES
+EXACT_ENGINES = [gum.LazyPropagation, gum.ShaferShenoyInference, gum.VariableElimination, OrderedJunctionTree]
+APPROXIMATE_ENGINES = [gum.GibbsSampling, gum.ImportanceSampling, gum.LoopyBeliefPropagation]
+INFERENCE_ENGINES = EXACT_ENGINES + APPROXIMATE_ENGINES
+HARD_EVIDENCE_ENGINES = [gum.GibbsSampling, gum.ImportanceSampling]  # the samplers reject likelihoods
+# "Auto" comes after the engines, BayesianModel.chooseEngine replaces it by one of them before a query
+AUTO_ENGINE = len(INFERENCE_ENGINES)
+INFERENCE_NAMES = ["Lazy Propagation", "Shafer Shenoy", "Variable Elimination", "Junction Tree (optimized order)",
+                   "Gibbs Sampling", "Importance Sampling", "Loopy Belief Propagation", "Auto"]
+# Stopping criteria of the approximate engines: the first one reached ends the inference. maxIterations counts
+# the samples of the sampling engines and the message passes of loopy belief propagation. The preparation of the
+# samplers and the burn-in of Gibbs sampling come before the clock of maxTime starts. The minimum rate of
+# decrease of epsilon of pyAgrum is disabled, it would stop the engines before these criteria are reached.
+DEFAULT_STOPPING = {"maxTime": 10.0, "epsilon": 1e-2, "maxIterations": 1000000}
+
+
+def isApproximate(index):
+    return index >= len(EXACT_ENGINES)
+
+
+def accuracy(ie):
+    # error reached by an approximate engine and why it stopped, None for an exact engine; epsilon is the last
+    # change of the estimates measured by the stopping test, recorded in the history of a verbose engine
+    if not isinstance(ie, tuple(APPROXIMATE_ENGINES)):
+        return None
+    history = ie.history()
+    return {"epsilon": history[-1] if history else float('nan'), "iterations": ie.nbrIterations(),
+            "time": ie.currentTime(), "stopped": ie.messageApproximationScheme()}
+
+
+def snapshotBN(bn):
+    # picklable copy of the network: name, domain size, parents in CPT order and CPT values of every variable
+    snapshot = []
+    for node in bn.nodes():
+        name = bn.variable(node).name()
+        cpt = bn.cpt(name)
+        # names lists the child first and then the parents in order of insertion
+        snapshot.append((name, bn.variable(node).domainSize(), list(cpt.names[1:]), cpt.toarray()))
+    return snapshot
+
+
+def restoreBN(snapshot):
+    bn = gum.BayesNet('Bayesian Net')
+    for name, domainSize, parents, values in snapshot:
+        bn.add(gum.LabelizedVariable(name, "", domainSize))
+    for name, domainSize, parents, values in snapshot:
+        for parent in parents:  # Same insertion order, so the CPT keeps the layout of values
+            bn.addArc(parent, name)
+    for name, domainSize, parents, values in snapshot:
+        bn.cpt(name).fillWith(values.flatten().tolist())
+    return bn
+
+
+class PosteriorStore:
+    # posteriors of all the nodes, kept one after the other in a single array
+    def __init__(self, posteriors):
+        self.offsets = {}  # node name -> (start, stop) of its posterior in self.values
+        start = 0
+        for name, posterior in posteriors:
+            self.offsets[name] = (start, start + posterior.size)
+            start += posterior.size
+        self.values = np.empty(start)
+        for name, posterior in posteriors:
+            begin, end = self.offsets[name]
+            self.values[begin:end] = posterior.flatten()
+
+    def get(self, nodeName):
+        # view on the posterior of the node, None if it was not computed
+        if nodeName not in self.offsets:
+            return None
+        begin, end = self.offsets[nodeName]
+        return self.values[begin:end]
+
+
+class InferenceCache:
+    def __init__(self, bn, pruned=False):
+        self.bn = bn
+        self.isPruned = pruned  # network pruned for a single query, its elimination order is not stored on the disk
+        self.engines = {}  # inference engines built on self.bn, keyed by inference mode index
+        self.dirtyPotentials = {}  # names of the nodes whose CPT changed since each cached engine was used
+        self.evidence = {}  # node name -> index of the observed state (hard) or likelihood list (soft)
+        self.engineEvidence = {}  # evidence currently set in each cached engine, keyed by inference mode index
+        self.families = None  # parents and children of every node, read from self.bn by the first pruning
+        self.pruned = None  # (requisite nodes, observed roots, InferenceCache) of the last pruned network
+
+    def updatePotential(self, nodeName, values):
+        # the structure is unchanged, only the potential of the node must be reloaded
+        self.bn.cpt(nodeName).fillWith(values.flatten().tolist())
+        for index in self.engines:
+            self.dirtyPotentials.setdefault(index, set()).add(nodeName)
+        if self.pruned is not None and nodeName in self.pruned[0]:  # The CPT of an observed root stays uniform
+            self.pruned[2].updatePotential(nodeName, values)
+
+    def prunedCache(self, target):
+        # cache of the network pruned to what the posterior of target depends on given the evidence
+        if self.families is None:
+            self.families = Relevance.families(self.bn)
+        requisite, roots = Relevance.requisiteNodes(*self.families, target, self.evidence)
+        if self.pruned is None or self.pruned[:2] != (requisite, roots):
+            self.pruned = (requisite, roots,
+                           InferenceCache(Relevance.pruneNetwork(self.bn, self.families[0], requisite, roots), True))
+        pruned = self.pruned[2]
+        pruned.evidence = {name: value for name, value in self.evidence.items() if name in requisite or name in roots}
+        return pruned
+
+    def getEngine(self, index, stopping=None):
+        if isApproximate(index):
+            # Built for every query: they are cheap to create, and sampling again after a change of evidence
+            # can hang some of them
+            soft = [name for name, value in self.evidence.items() if isinstance(value, list)]
+            if soft and INFERENCE_ENGINES[index] in HARD_EVIDENCE_ENGINES:
+                raise ValueError("{} only accepts hard evidence, but {} {} a likelihood. Remove the likelihoods or "
+                                 "choose another engine.".format(INFERENCE_NAMES[index], ", ".join(sorted(soft)),
+                                                                 "has" if len(soft) == 1 else "have"))
+            ie = INFERENCE_ENGINES[index](self.bn)
+            ie.setVerbosity(True)  # Keeps the history of epsilon, nothing is printed
+            ie.setMinEpsilonRate(0)
+            stopping = stopping or DEFAULT_STOPPING
+            ie.setMaxTime(stopping["maxTime"])
+            ie.setEpsilon(stopping["epsilon"])
+            ie.setMaxIter(stopping["maxIterations"])
+            for nodeName, value in self.evidence.items():
+                ie.addEvidence(nodeName, value)
+            return ie
+        ie = self.engines.get(index)
+        applied = self.engineEvidence.get(index, {})
+        if ie is None:  # First query with this engine since the last structural edit
+            if INFERENCE_ENGINES[index] is OrderedJunctionTree:
+                ie = OrderedJunctionTree(self.bn, storeOrder=not self.isPruned)
+            else:
+                ie = INFERENCE_ENGINES[index](self.bn)
+            self.engines[index] = ie
+        elif index in self.dirtyPotentials and isinstance(ie, OrderedJunctionTree):
+            for nodeName in self.dirtyPotentials.pop(index):  # Its arrays are read from self.bn again
+                ie.reloadPotential(nodeName)
+        elif index in self.dirtyPotentials:
+            # The evidence projects the CPTs it touches, so it is erased while the edited potentials are reloaded
+            if applied:
+                ie.eraseAllEvidence()
+                ie.makeInference()
+                applied = {}
+            # A neutral likelihood added and then erased on an edited node invalidates the messages that
+            # depend on its CPT, so the engine reloads it without compiling the junction tree again
+            for nodeName in self.dirtyPotentials.pop(index):
+                ie.addEvidence(nodeName, [1] * self.bn.variable(nodeName).domainSize())
+                ie.makeInference()
+                ie.eraseEvidence(nodeName)
+        # Post only the evidence that changed, the engine updates its messages incrementally
+        for nodeName in applied.keys() - self.evidence.keys():
+            ie.eraseEvidence(nodeName)
+        for nodeName, value in self.evidence.items():
+            if nodeName not in applied:
+                ie.addEvidence(nodeName, value)
+            elif applied[nodeName] != value:
+                ie.chgEvidence(nodeName, value)
+        self.engineEvidence[index] = dict(self.evidence)
+        return ie
+
+
+def serve(connection):
+    # main loop of the inference process, only the requests of posteriors get a reply
+    cache = None
+    failure = None  # error raised by an update, reported at the next request of a posterior
+    while True:
+        try:
+            message = connection.recv()
+        except EOFError:  # The GUI has closed its end of the pipe
+            return
+        try:
+            if message[0] == 'network':
+                cache = None
+                failure = None
+                cache = InferenceCache(restoreBN(message[1]))
+            elif message[0] == 'potential':
+                cache.updatePotential(message[1], message[2])
+            elif failure is not None:
+                connection.send(('error', failure))
+            elif message[0] == 'posteriors':
+                start = time.perf_counter()
+                cache.evidence = message[2]
+                ie = cache.getEngine(message[1], message[3])
+                ie.makeInference()  # One propagation, every node is a target
+                posteriors = [(cache.bn.variable(node).name(), ie.posterior(node).toarray())
+                              for node in cache.bn.nodes()]
+                connection.send(('posteriors', PosteriorStore(posteriors), time.perf_counter() - start,
+                                 accuracy(ie)))
+            else:
+                start = time.perf_counter()
+                cache.evidence = message[3]
+                pruned = cache.prunedCache(message[2])
+                ie = pruned.getEngine(message[1], message[4])
+                ie.makeInference()
+                posterior = ie.posterior(message[2]).toarray()
+                connection.send(('posterior', message[2], posterior, time.perf_counter() - start, accuracy(ie),
+                                 (pruned.bn.size(), cache.bn.size())))
+        except Exception as e:
+            if message[0] in ('posterior', 'posteriors'):
+                connection.send(('error', str(e)))
+            else:
+                failure = str(e)
+
+
+class InferenceClient:
+    def __init__(self):
+        self.process = None
+        self.connection = None
+
+    def isStarted(self):
+        return self.process is not None
+
+    def send(self, *message):
+        if self.process is None:
+            # spawn, so that the child does not inherit the state of the Qt application
+            context = multiprocessing.get_context('spawn')
+            self.connection, childConnection = context.Pipe()
+            self.process = context.Process(target=serve, args=(childConnection,), daemon=True)
+            self.process.start()
+            childConnection.close()
+        self.connection.send(message)
+
+    def poll(self):
+        # return the reply of the server if one is available, None otherwise
+        try:
+            if self.connection.poll():
+                return self.connection.recv()
+            if self.process.is_alive():
+                return None
+        except (EOFError, OSError):  # The process died while sending its reply
+            pass
+        self.stop()
+        return 'error', 'The inference process terminated unexpectedly'
+
+    def stop(self):
+        # kill the server: the computation in progress is lost together with the cached engines
+        if self.process is not None:
+            self.process.terminate()
+            self.connection.close()
+            self.process = None
+            self.connection = None
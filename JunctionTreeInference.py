@@ -0,0 +1,139 @@
+import numpy as np
+import pyAgrum as gum
+
+import EliminationOrder
+
+''' Junction Tree Inference
+
+    Description:
+        This file contains an exact inference engine that follows the elimination order of EliminationOrder
+        instead of the triangulation of pyAgrum. Every step of the elimination gives a cluster, the eliminated node
+        and its neighbours, whose parent is the cluster of the first of these neighbours to be eliminated: this is
+        a junction tree. Every CPT and every evidence is multiplied into the cluster of the first node of its
+        family to be eliminated. makeInference sends the messages from the leaves to the roots, which is variable
+        elimination along the order, and the messages back to the leaves are computed when a posterior needs them
+        (Shafer-Shenoy), so a single posterior costs little more than one variable elimination. The engine has the
+        methods of the pyAgrum engines used by InferenceServer; storeOrder False keeps the order of a network pruned
+        for a single query out of the disk cache of EliminationOrder.
+
+'''
+
+
+def contract(factors, axes, domainSizes):
+    # product of the factors, (names of the axes, array) pairs, summed over every axis not in axes
+    labels = {}
+    operands = []
+    for names, values in factors:
+        operands += [values, [labels.setdefault(name, len(labels)) for name in names]]
+    if len(labels) > 52:  # Letters of einsum; a cluster that large would not fit in memory anyway
+        raise MemoryError("A cluster of the junction tree has {} variables".format(len(labels)))
+    present = [name for name in axes if name in labels]
+    result = np.einsum(*operands, [labels[name] for name in present], optimize=True) if operands else np.ones(())
+    if len(present) < len(axes):
+        # a fill-in edge of the triangulation can bring a variable that none of the factors depends on
+        result = np.broadcast_to(result.reshape([domainSizes[name] if name in labels else 1 for name in axes]),
+                                 [domainSizes[name] for name in axes])
+    total = result.sum()
+    return result / total if total > 0 else result  # Scaled, so long chains of messages do not underflow
+
+
+class OrderedJunctionTree:
+    def __init__(self, bn, storeOrder=True):
+        self.bn = bn
+        domainSizes, arcs = EliminationOrder.networkStructure(bn)
+        self.domainSizes = domainSizes
+        elimination = EliminationOrder.bestOrder(domainSizes, arcs, store=storeOrder)
+        self.clusters = [tuple(cluster) for cluster in elimination["clusters"]]
+        from InferenceCost import CELL_BYTES, memoryLimit  # It imports InferenceServer, which imports this file
+        size = max([EliminationOrder.clusterCells(domainSizes, [cluster]) for cluster in self.clusters] or [0])
+        if size * CELL_BYTES > memoryLimit():  # Refused before numpy allocates more than the memory
+            raise MemoryError("The largest cluster of the junction tree has {} cells".format(size))
+        self.position = {cluster[0]: i for i, cluster in enumerate(self.clusters)}  # node -> its cluster
+        self.parents = [min((self.position[name] for name in cluster[1:]), default=None)
+                        for cluster in self.clusters]
+        self.children = [[] for _ in self.clusters]
+        for child, parent in enumerate(self.parents):
+            if parent is not None:
+                self.children[parent].append(child)
+        self.factors = {}  # node name -> (names of the axes, CPT array)
+        self.home = {}  # node name -> cluster its CPT is multiplied into
+        for node in bn.nodes():
+            self.reloadPotential(bn.variable(node).name())
+        self.evidence = {}  # node name -> index of the observed state or list of likelihoods
+        self.local = None  # CPTs and evidence multiplied into every cluster
+        self.upward = None  # message of every cluster to its parent, None before makeInference
+        self.downward = {}  # message of the parent of a cluster to it, computed on demand
+
+    def reloadPotential(self, nodeName):
+        cpt = self.bn.cpt(nodeName)
+        names = tuple(reversed(cpt.names))  # Axes of toarray, the child last
+        self.factors[nodeName] = (names, cpt.toarray())
+        self.home[nodeName] = min(self.position[name] for name in names)
+        self.upward = None
+
+    def addEvidence(self, nodeName, value):
+        self.evidence[nodeName] = value
+        self.upward = None
+
+    chgEvidence = addEvidence
+
+    def eraseEvidence(self, nodeName):
+        self.evidence.pop(nodeName, None)
+        self.upward = None
+
+    def eraseAllEvidence(self):
+        self.evidence = {}
+        self.upward = None
+
+    def makeInference(self):
+        if self.upward is not None:
+            return
+        self.local = [[] for _ in self.clusters]
+        for nodeName, (names, values) in self.factors.items():
+            self.local[self.home[nodeName]].append((names, values))
+        for nodeName, value in self.evidence.items():
+            likelihood = np.zeros(self.bn.variable(nodeName).domainSize())
+            if isinstance(value, (int, np.integer)):
+                likelihood[value] = 1
+            else:
+                likelihood[:] = value
+            self.local[self.position[nodeName]].append(((nodeName,), likelihood))
+        # the clusters are in the order of elimination, so the children of a cluster come before it
+        self.upward = []
+        for index, cluster in enumerate(self.clusters):
+            incoming = [(self.clusters[child][1:], self.upward[child]) for child in self.children[index]]
+            self.upward.append(contract(self.local[index] + incoming, cluster[1:], self.domainSizes))
+        self.downward = {}
+
+    def downwardMessage(self, index):
+        # message of the parent of the cluster to it, over the neighbours of its eliminated node; the messages
+        # missing on the path from the root are computed from the top, a long chain would overflow a recursion
+        path = []
+        while index not in self.downward and self.parents[index] is not None:
+            path.append(index)
+            index = self.parents[index]
+        for index in reversed(path):
+            parent = self.parents[index]
+            factors = list(self.local[parent])
+            factors += [(self.clusters[child][1:], self.upward[child]) for child in self.children[parent]
+                        if child != index]
+            if self.parents[parent] is not None:
+                factors.append((self.clusters[parent][1:], self.downward[parent]))
+            self.downward[index] = contract(factors, self.clusters[index][1:], self.domainSizes)
+        return self.downward[path[0]] if path else self.downward[index]
+
+    def posterior(self, node):
+        name = node if isinstance(node, str) else self.bn.variable(node).name()
+        self.makeInference()
+        index = self.position[name]
+        factors = self.local[index] + [(self.clusters[child][1:], self.upward[child])
+                                       for child in self.children[index]]
+        if self.parents[index] is not None:
+            factors.append((self.clusters[index][1:], self.downwardMessage(index)))
+        values = contract(factors, (name,), self.domainSizes)
+        if not values.sum() > 0:
+            raise ValueError("The evidence is impossible")
+        posterior = gum.Potential()
+        posterior.add(self.bn.variable(name))
+        posterior.fillWith((values / values.sum()).tolist())
+        return posterior
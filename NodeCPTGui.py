@@ -1,24 +1,159 @@
-from dataclasses import dataclass
-from itertools import islice
-
 import matplotlib.pyplot as plt
 from PyQt5 import QtCore, QtGui, QtWidgets
-from iteration_utilities import deepflatten
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
-from numpy import linspace
-from scipy.stats import norm, maxwell
-from sympy import var, lambdify, sympify
+import numpy as np
+
+from BayesianModel import CPTTable
+from CPTExpression import evaluateExpression
+from InferenceServer import INFERENCE_NAMES
+
+# Distributions selectable for the rows of a RangeVariable CPT
+FUNCTIONS = ["Norm", "Maxwell", "Custom"]
+# Lines drawn in the plot when no row of the table is selected
+MAX_PLOTTED_ROWS = 10
+
+
+class CPTTableModel(QtCore.QAbstractTableModel):
+    # One row per configuration of the parents, in the order of loopIn(): the labels of the parents are computed
+    # from the row number, so the view asks only for the rows that are visible
+    def __init__(self, parentNames, parentLabels, columns):
+        super().__init__()
+        self.parentNames = parentNames
+        self.parentLabels = parentLabels
+        self.shape = tuple(len(labels) for labels in parentLabels)
+        self.columns = columns  # names of the editable columns, after the ones of the parents
+        self.nRows = int(np.prod(self.shape))
+
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        return 0 if parent.isValid() else self.nRows
+
+    def columnCount(self, parent=QtCore.QModelIndex()):
+        return 0 if parent.isValid() else len(self.parentNames) + len(self.columns)
+
+    def headerData(self, section, orientation, role=QtCore.Qt.DisplayRole):
+        if role == QtCore.Qt.DisplayRole and orientation == QtCore.Qt.Horizontal:
+            return (self.parentNames + self.columns)[section]
+        return super().headerData(section, orientation, role)
+
+    def rowLabels(self, row):
+        # labels of the parents in the row
+        return [labels[i] for labels, i in zip(self.parentLabels, np.unravel_index(row, self.shape))]
+
+    def data(self, index, role=QtCore.Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        if role == QtCore.Qt.TextAlignmentRole:
+            return QtCore.Qt.AlignCenter
+        column = index.column() - len(self.parentNames)
+        if column < 0:
+            if role == QtCore.Qt.DisplayRole:
+                return self.parentLabels[index.column()][np.unravel_index(index.row(), self.shape)[index.column()]]
+            return None
+        return self.valueData(index.row(), column, role)
+
+    def flags(self, index):
+        if index.column() < len(self.parentNames):
+            return QtCore.Qt.ItemIsEnabled | QtCore.Qt.ItemIsSelectable
+        return QtCore.Qt.ItemIsEnabled | QtCore.Qt.ItemIsSelectable | QtCore.Qt.ItemIsEditable
+
+    def setData(self, index, value, role=QtCore.Qt.EditRole):
+        column = index.column() - len(self.parentNames)
+        if role != QtCore.Qt.EditRole or column < 0:
+            return False
+        self.setValue(index.row(), column, value)
+        # the other editable cells of the row may depend on the edited one
+        self.dataChanged.emit(self.index(index.row(), len(self.parentNames)),
+                              self.index(index.row(), self.columnCount() - 1))
+        return True
+
+
+class ProbabilityTableModel(CPTTableModel):
+    # CPT of a binary node, the probability of false and of true for every configuration of the parents
+    def __init__(self, parentNames, parentLabels, rows):
+        super().__init__(parentNames, parentLabels, ["F", "T"])
+        self.values = np.array(rows, dtype=float)
+        self.values[self.values.sum(axis=1) == 0] = 0.5  # Rows never filled are shown as uniform
+
+    def valueData(self, row, column, role):
+        if role == QtCore.Qt.DisplayRole:
+            return "{:.6g}".format(self.values[row, column])
+        if role == QtCore.Qt.EditRole:
+            return float(self.values[row, column])
+        return None
+
+    def setValue(self, row, column, value):
+        value = min(max(float(value), 0.0), 1.0)
+        self.values[row, column] = value
+        self.values[row, 1 - column] = round(1 - value, 10)  # Arrotondo per evitare rappresentazioni imprecise
+
+
+class DistributionTableModel(CPTTableModel):
+    # CPT of a RangeVariable, the distribution and the interval it is truncated to for every configuration
+    def __init__(self, parentNames, parentLabels):
+        super().__init__(parentNames, parentLabels, ["Function", "Start", "Stop"])
+        self.functions = np.zeros(self.nRows, dtype=int)  # index in FUNCTIONS
+        self.bounds = np.zeros((self.nRows, 2))  # start and stop
 
+    def valueData(self, row, column, role):
+        if column == 0:
+            if role == QtCore.Qt.DisplayRole:
+                return FUNCTIONS[self.functions[row]]
+            if role == QtCore.Qt.EditRole:
+                return int(self.functions[row])
+        elif role in (QtCore.Qt.DisplayRole, QtCore.Qt.EditRole):
+            return float(self.bounds[row, column - 1])
+        return None
 
-@dataclass
-class HistogramArguments:
-    function = None
-    vmin = None
-    vmax = None
+    def setValue(self, row, column, value):
+        if column == 0:
+            self.functions[row] = int(value)
+        else:
+            self.bounds[row, column - 1] = float(value)
+
+
+class ChoiceDelegate(QtWidgets.QStyledItemDelegate):
+    # edits the index of a choice with a combo box
+    def __init__(self, items, parent=None):
+        super().__init__(parent)
+        self.items = items
+
+    def createEditor(self, parent, option, index):
+        editor = QtWidgets.QComboBox(parent)
+        editor.addItems(self.items)
+        return editor
+
+    def setEditorData(self, editor, index):
+        editor.setCurrentIndex(index.data(QtCore.Qt.EditRole))
+
+    def setModelData(self, editor, model, index):
+        model.setData(index, editor.currentIndex())
+
+
+class SpinBoxDelegate(QtWidgets.QStyledItemDelegate):
+    # edits a float with a spin box limited to a range
+    def __init__(self, minimum, maximum, decimals, parent=None):
+        super().__init__(parent)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.decimals = decimals
+
+    def createEditor(self, parent, option, index):
+        editor = QtWidgets.QDoubleSpinBox(parent)
+        editor.setRange(self.minimum, self.maximum)
+        editor.setDecimals(self.decimals)
+        editor.setSingleStep(10 ** -min(self.decimals, 2))
+        return editor
+
+    def setEditorData(self, editor, index):
+        editor.setValue(index.data(QtCore.Qt.EditRole))
+
+    def setModelData(self, editor, model, index):
+        editor.interpretText()
+        model.setData(index, editor.value())
 
 
 class Ui_CPTWindow(QtWidgets.QMainWindow):
-    def __init__(self, graph_scene, nodeName, posterior=None):
+    def __init__(self, graph_scene, nodeName, posterior=None, details=None):
         super().__init__()
         self.font = QtGui.QFont()
         self.font.setPointSize(12)
@@ -26,22 +161,22 @@ class Ui_CPTWindow(QtWidgets.QMainWindow):
         self.font.setWeight(75)
         self.scene = graph_scene
         self.posterior = posterior
-        self.nodeCPT = self.scene.bn.cpt(nodeName)  # CPT del nodo
+        # valori del CPT o della posterior, read before cpt() so a CPT kept in a project file is not read back
+        self.table = self.scene.model.cptTable(nodeName) if posterior is None else CPTTable(posterior)
+        self.nodeCPT = self.scene.model.cpt(nodeName)  # CPT del nodo
         self.numParents = self.nodeCPT.nbrDim() - 1  # Numero di genitori
         self.nodeName = nodeName  # Nome del nodo
         self.scrollArea = QtWidgets.QScrollArea()
-        self.grid = QtWidgets.QGridLayout()
         self.central_widget = QtWidgets.QWidget()
+        self.verticalLayout = QtWidgets.QVBoxLayout()
+        self.verticalLayout.setObjectName("verticalLayout_2")
+        self.central_widget.setLayout(self.verticalLayout)
+        self.scrollArea.setWidgetResizable(True)
+        self.scrollArea.setWidget(self.central_widget)
+        self.setCentralWidget(self.scrollArea)
         self.setWindowTitle("CPT of " + self.nodeName)
-        if self.nodeCPT.var_dims[-1] == 2:  # If it's a LabelizedVariable
-            self.central_widget.setLayout(self.grid)
-            self.scrollArea.setWidgetResizable(True)
-            self.scrollArea.setWidget(self.central_widget)
-            self.setCentralWidget(self.scrollArea)
+        if self.table.shape[-1] == 2:  # If it's a LabelizedVariable
             self.labelizedVariable = True
-            self.sliders = []
-            self.trueLabels = []
-            self.falseLabels = []
             self.setupLabelizedUI()
         else:  # If it's a RangeVariable
             self.labelizedVariable = False
@@ -54,61 +189,35 @@ class Ui_CPTWindow(QtWidgets.QMainWindow):
             # this is the Navigation widget
             # it takes the Canvas widget and a parent
             # self.toolbar = NavigationToolbar(self.canvas, self)
-            self.verticalLayout = QtWidgets.QVBoxLayout()
-            self.verticalLayout.setObjectName("verticalLayout_2")
-            self.central_widget.setLayout(self.verticalLayout)
             if self.posterior is None:
                 self.scrollArea.setMinimumSize(670, 730)
             else:
                 self.scrollArea.setMinimumSize(670, 550)
-            self.scrollArea.setWidget(self.central_widget)
-            self.setCentralWidget(self.scrollArea)
-            self.HistogramArguments = []
             self.setupRangeUI()
-            self.central_widget.adjustSize()
-
-    def setupRangeUI(self):
-        # Metto il nome del nodo attuale in alto a destra nella griglia
-        label = QtWidgets.QLabel()
-        label.setFont(self.font)
-        label.setAlignment(QtCore.Qt.AlignCenter)
-        label.setText(self.nodeName)
-        self.verticalLayout.addWidget(label)
-        if self.posterior is None:
-            self.genVariables()
-            label = QtWidgets.QLabel()
-            label.setFont(self.font)
-            label.setAlignment(QtCore.Qt.AlignCenter)
-            label.setText("Function")
-            self.grid.addWidget(label, 1, self.numParents)
-            label = QtWidgets.QLabel()
-            label.setFont(self.font)
-            label.setAlignment(QtCore.Qt.AlignCenter)
-            label.setText("Start")
-            self.grid.addWidget(label, 1, self.numParents + 1)
+        if details:  # Size of the pruned network and error of an approximate inference
             label = QtWidgets.QLabel()
-            label.setFont(self.font)
             label.setAlignment(QtCore.Qt.AlignCenter)
-            label.setText("Stop")
-            self.grid.addWidget(label, 1, self.numParents + 2)
-            nrows = self.grid.rowCount()
-            if self.numParents == 0:
-                nrows += 1
-            for index, row in enumerate(range(2, nrows)):
-                self.HistogramArguments.append(HistogramArguments())
-                self.HistogramArguments[index].function = QtWidgets.QComboBox()
-                self.HistogramArguments[index].function.addItems(["Norm", "Maxwell", "Custom"])
-                self.HistogramArguments[index].vmin = QtWidgets.QDoubleSpinBox()
-                self.HistogramArguments[index].vmin.setRange(-1000, 1000)
-                self.HistogramArguments[index].vmax = QtWidgets.QDoubleSpinBox()
-                self.HistogramArguments[index].vmax.setRange(-1000, 1000)
-                self.grid.addWidget(self.HistogramArguments[index].function, row, self.numParents)
-                self.grid.addWidget(self.HistogramArguments[index].vmin, row, self.numParents + 1)
-                self.grid.addWidget(self.HistogramArguments[index].vmax, row, self.numParents + 2)
+            label.setWordWrap(True)
+            label.setText(details)
+            self.verticalLayout.addWidget(label)
 
-            widget = QtWidgets.QWidget()
-            widget.setLayout(self.grid)
-            self.verticalLayout.addWidget(widget)
+    def setupRangeUI(self):
+        # Metto il nome del nodo attuale in alto
+        self.verticalLayout.addWidget(self.nameLabel())
+        if self.posterior is None:
+            self.cptModel = DistributionTableModel(self.table.names[:-1], self.parentLabels())
+            self.cptView = self.createTableView(self.cptModel)
+            self.cptView.setItemDelegateForColumn(self.numParents, ChoiceDelegate(FUNCTIONS, self.cptView))
+            for column in (self.numParents + 1, self.numParents + 2):
+                self.cptView.setItemDelegateForColumn(column, SpinBoxDelegate(-1000, 1000, 2, self.cptView))
+            # Il grafico mostra le righe selezionate
+            self.cptView.selectionModel().selectionChanged.connect(lambda selected, deselected: self.plot())
+            self.verticalLayout.addWidget(self.cptView)
+            # Una sola funzione per tutte le righe Custom, valutata insieme su tutte le righe
+            self.customFunction = QtWidgets.QLineEdit()
+            self.customFunction.setPlaceholderText("Custom function of x and of the parents, e.g. norm.pdf(x, loc=" +
+                                                   (self.table.names[0] + "*10)" if self.numParents else "2)"))
+            self.verticalLayout.addWidget(self.customFunction)
             # Aggiungo il bottone per confermare il CPT e chiudere la finestra
             horizontalLayout = QtWidgets.QHBoxLayout()
             button = QtWidgets.QPushButton('OK', self)
@@ -130,112 +239,85 @@ class Ui_CPTWindow(QtWidgets.QMainWindow):
         self.figure.clear()
         # create an axis
         ax = self.figure.add_subplot(111)
-        # get the data from the CPT
-        if self.posterior is None:
-            cpt = self.nodeCPT
-        else:
-            cpt = self.posterior
-        values = []
-        for i in cpt.loopIn():
-            values.append(cpt.get(i))
-        # plot the data
-        for line in self.make_chunks(values, cpt.var_dims[-1]):
-            ax.plot(line)
+        # plot the data, one line per selected configuration of the parents
+        rows = self.plottedRows()
+        ax.plot(self.table.rows(rows).T)
         plt.title("P(" + self.nodeName + ")")
         if self.posterior is None:
-            legendStr = ""
-            for row in range(2, self.grid.rowCount()):
-                if row != 2:
-                    legendStr += ";"
-                legendStr += "P(" + self.nodeName + "|"
-                for col, variable in enumerate(cpt.var_names):
-                    if variable != self.nodeName:
-                        if col != 0:
-                            legendStr += ", "
-                        legendStr += variable + "=" + self.grid.itemAtPosition(row, col).widget().text()
-                legendStr += ")"
-            plt.legend(legendStr.split(";"), loc="best")
+            legend = []
+            for row in rows:
+                legend.append("P(" + self.nodeName + "|" + ", ".join(
+                    parent + "=" + label for parent, label in zip(self.cptModel.parentNames,
+                                                                  self.cptModel.rowLabels(row))) + ")")
+            plt.legend(legend, loc="best")
         # refresh canvas
         self.canvas.draw()
 
-    def make_chunks(self, data, SIZE):
-        it = iter(data)
-        for i in range(0, len(data), SIZE):
-            yield [k for k in islice(it, SIZE)]
+    def plottedRows(self):
+        # the rows selected in the table, or the first ones: thousands of lines could not be read anyway
+        if self.posterior is not None:
+            return [0]
+        rows = sorted({index.row() for index in self.cptView.selectionModel().selectedRows()})
+        if not rows:
+            rows = list(range(min(MAX_PLOTTED_ROWS, self.cptModel.rowCount())))
+        return rows[:MAX_PLOTTED_ROWS]
 
-    def setupLabelizedUI(self):
-        # Metto il nome del nodo attuale in alto a destra nella griglia
+    def parentLabels(self):
+        # binary parents are shown as false/true, the others with their own labels
+        return [["F", "T"] if len(labels) == 2 else labels for labels in self.table.labels[:-1]]
+
+    def nameLabel(self):
         label = QtWidgets.QLabel()
         label.setFont(self.font)
         label.setAlignment(QtCore.Qt.AlignCenter)
         label.setText(self.nodeName)
+        return label
+
+    def createTableView(self, model):
+        view = QtWidgets.QTableView()
+        view.setModel(model)
+        view.setSelectionBehavior(QtWidgets.QAbstractItemView.SelectRows)
+        # Rows of fixed height, so the view never measures the rows that are not visible
+        view.verticalHeader().setSectionResizeMode(QtWidgets.QHeaderView.Fixed)
+        view.verticalHeader().setDefaultSectionSize(view.fontMetrics().height() + 10)
+        view.horizontalHeader().setSectionResizeMode(QtWidgets.QHeaderView.Stretch)
+        view.horizontalHeader().setFont(self.font)
+        return view
+
+    def setupLabelizedUI(self):
+        # Metto il nome del nodo attuale in alto
         if self.posterior is None:
-            if self.numParents > 0:
-                emptyBox = QtWidgets.QLabel()  # Box vuoto in alto a sinistra nella griglia
-                self.grid.addWidget(emptyBox, 0, 0, 1, self.numParents)
-                self.grid.addWidget(label, 0, self.numParents, 1, 3)
-                self.genVariables()
-            else:
-                self.grid.addWidget(label, 0, 0, 1, 3)
-                # Creo i box delle proabilità
-            self.genSliders()
+            self.verticalLayout.addWidget(self.nameLabel())
+            # Creo la tabella delle probabilità
+            self.cptModel = ProbabilityTableModel(self.table.names[:-1], self.parentLabels(), self.table.rows())
+            self.cptView = self.createTableView(self.cptModel)
+            for column in (self.numParents, self.numParents + 1):
+                self.cptView.setItemDelegateForColumn(column, SpinBoxDelegate(0, 1, 4, self.cptView))
+            self.verticalLayout.addWidget(self.cptView)
             # Aggiungo il bottone per confermare il CPT e chiudere la finestra
             button = QtWidgets.QPushButton('OK', self)
-            self.grid.addWidget(button, self.grid.rowCount(), 0, 1, self.grid.columnCount())
             button.clicked.connect(self.closeWindow)
+            self.verticalLayout.addWidget(button)
 
             # Aggiungo comandi per l'inferenza
-            self.verticalLayout = QtWidgets.QVBoxLayout()
-            self.verticalLayout.setObjectName("verticalLayout_2")
             self.setupInferenceLayout()
-            self.grid.addLayout(self.verticalLayout, self.grid.rowCount(), 0, 1, self.grid.columnCount())
         else:
-            self.grid.addWidget(label, 0, 0, 1, 2)
-            posterior = self.posterior.__str__().split('/')
-            falsePosterior = QtWidgets.QLabel()
-            falsePosterior.setAlignment(QtCore.Qt.AlignCenter)
-            falsePosterior.setText(posterior[0].split('::')[1])
-            self.grid.addWidget(falsePosterior, 2, 0, 1, 1)
-            truePosterior = QtWidgets.QLabel()
-            truePosterior.setAlignment(QtCore.Qt.AlignCenter)
-            truePosterior.setText(posterior[1].split('::')[1])
-            self.grid.addWidget(truePosterior, 2, 1, 1, 1)
-        # Creo la riga del vero/falso affianco le variabili
-        for col_offset, domain in enumerate(["F", "T"]):
-            label = QtWidgets.QLabel()
-            label.setFont(self.font)
-            label.setAlignment(QtCore.Qt.AlignCenter)
-            label.setText(str(domain))
-            if col_offset == 1 and self.posterior is None:
-                col_offset += 1  # Offset one more because of the sliders
-            if self.posterior is None:
-                self.grid.addWidget(label, 1, self.numParents + col_offset, 1, 1)
-            else:
-                self.grid.addWidget(label, 1, col_offset, 1, 1)
-
-    def genVariables(self):
-        # Creo la la riga delle variabili
-        for var in range(self.numParents):
-            label = QtWidgets.QLabel()
-            label.setFont(self.font)
-            label.setAlignment(QtCore.Qt.AlignCenter)
-            label.setText(self.nodeCPT.var_names[var])
-            self.grid.addWidget(label, 1, var, 1, 1)
-
-        # Creo la griglia dei vero/falso delle rispettive variabili sulla sinistra
-        domainSet = []
-        for parent in self.nodeCPT.var_names:
-            if parent != self.nodeName:
-                parent = self.scene.bn.variableFromName(parent)
-                domain = parent.domain()
-                if domain[0] == '<':  # Nel caso si tratti di una labelizedVariable,
-                    # di solito ci sono solo le label di vero e falso
-                    domain = ["F", "T"]
-                else:  # Nel caso di una rangeVariable, inserisco nel domainSet tutte le label del dominio
-                    domain = domain[1:-1].split(",")
-                    domain = list(range(int(domain[0]), int(domain[1]) + 1))
-                domainSet.append(domain)
-        self.genGrid(1, 0, domainSet)
+            grid = QtWidgets.QGridLayout()
+            grid.addWidget(self.nameLabel(), 0, 0, 1, 2)
+            # Creo la riga del vero/falso sopra le probabilità
+            for col, (domain, value) in enumerate(zip(["F", "T"], self.table.array())):
+                label = QtWidgets.QLabel()
+                label.setFont(self.font)
+                label.setAlignment(QtCore.Qt.AlignCenter)
+                label.setText(domain)
+                grid.addWidget(label, 1, col, 1, 1)
+                label = QtWidgets.QLabel()
+                label.setAlignment(QtCore.Qt.AlignCenter)
+                label.setText("{:.6g}".format(value))
+                grid.addWidget(label, 2, col, 1, 1)
+            widget = QtWidgets.QWidget()
+            widget.setLayout(grid)
+            self.verticalLayout.addWidget(widget)
 
     def setupInferenceLayout(self):
         self.inference_header = QtWidgets.QLabel()
@@ -244,7 +326,7 @@ class Ui_CPTWindow(QtWidgets.QMainWindow):
         self.inference_header.setObjectName("inference_header")
         self.verticalLayout.addWidget(self.inference_header)
         self.inferenceMode = QtWidgets.QComboBox()
-        self.inferenceMode.addItems(["Lazy Propagation", "Shafer Shenoy", "Variable Elimination"])
+        self.inferenceMode.addItems(INFERENCE_NAMES)
         self.verticalLayout.addWidget(self.inferenceMode)
         self.inference_header.setText("-Inference-")
         self.inference_btn = QtWidgets.QPushButton()
@@ -253,116 +335,49 @@ class Ui_CPTWindow(QtWidgets.QMainWindow):
         self.inference_btn.clicked.connect(
             lambda: self.scene.makeInference(self.nodeName, self.inferenceMode.currentIndex()))
         self.verticalLayout.addWidget(self.inference_btn)
-
-    def genSliders(self):
-        splittedCPT = self.nodeCPT.__str__().split('/')
-        col = self.grid.columnCount()
-        n_rows = self.grid.rowCount() - 2
-        if n_rows <= 0:
-            n_rows = 1
-        cpt_counter = 0
-        for row in range(n_rows):
-            self.sliders.append(QtWidgets.QSlider(QtCore.Qt.Horizontal))
-            self.trueLabels.append(QtWidgets.QLabel())
-            self.falseLabels.append(QtWidgets.QLabel())
-            self.sliders[row].setMaximum(100)
-            self.sliders[row].setMinimum(0)
-            self.sliders[row].setSingleStep(1)
-            self.sliders[row].setTickInterval(10)
-            self.sliders[row].setTickPosition(QtWidgets.QSlider.TicksBelow)
-            true = float(splittedCPT[cpt_counter + 1].split('::')[1])
-            false = float(splittedCPT[cpt_counter].split('::')[1])
-            if false == 0 and true == 0:
-                self.sliders[row].setValue(50)
-                self.trueLabels[row].setText("0.5")
-                self.falseLabels[row].setText("0.5")
-            else:
-                self.sliders[row].setValue(true * 100)
-                self.trueLabels[row].setText(str(true))
-                self.falseLabels[row].setText(str(false))
-            self.sliders[row].setTickPosition(QtWidgets.QSlider.TicksBelow)
-            self.sliders[row].valueChanged.connect(
-                lambda sv, falseLabel=self.falseLabels[row], trueLabel=self.trueLabels[row]:
-                self.updateSlidLabel(sv, falseLabel, trueLabel))
-            self.grid.addWidget(self.falseLabels[row], row + 2, col - 3)
-            self.grid.addWidget(self.sliders[row], row + 2, col - 2)
-            self.grid.addWidget(self.trueLabels[row], row + 2, col - 1)
-            cpt_counter = cpt_counter + 2
-
-    def updateSlidLabel(self, sliderValue, falseLabel, trueLabel):
-        value = sliderValue / 100
-        falseLabel.setText(str(round(1 - value, 2)))  # Approssimo per evitare rappresentazioni imprecise del float
-        trueLabel.setText(str(value))
+        self.evidence_btn = QtWidgets.QPushButton()
+        self.evidence_btn.setObjectName("evidence_CPT_btn")
+        self.evidence_btn.setText("SET EVIDENCE")
+        self.evidence_btn.clicked.connect(lambda: self.scene.editEvidence(self.nodeName))
+        self.verticalLayout.addWidget(self.evidence_btn)
 
     def updateCPT(self):
-        probabilities = []
+        # return False, after telling the user, if the CPT could not be computed
         if self.labelizedVariable:
-            for false, true in zip(self.falseLabels, self.trueLabels):
-                probabilities.append(float(false.text()))
-                probabilities.append(float(true.text()))
-            self.nodeCPT.fillWith(probabilities)
+            probabilities = self.cptModel.values
         else:
-            # Calculate all the values
-            functions = []
-            for index, args in enumerate(self.HistogramArguments, start=1):
-                function = args.function.currentIndex()
-                if function == 0:
-                    function = norm().pdf
-                elif function == 1:
-                    function = maxwell().pdf
-                else:
-                    function = self.getUserFunction(index)
-                functions.append(self.normalize(function, args.vmin.value(), args.vmax.value()))
-            # Flatten all the values in a single list
-            functions = list(deepflatten(functions))
-            # Update the cpt with the values
-            for cpt, value in zip(self.nodeCPT.loopIn(), functions):
-                self.nodeCPT.set(cpt, value)
+            from scipy.stats import norm, maxwell  # slow to import, loaded when a CPT is first applied
+            # One row per parent configuration, in the same order as loopIn(), the states of the child on the columns
+            choices = self.cptModel.functions
+            bounds = self.cptModel.bounds
+            points = np.linspace(bounds[:, 0], bounds[:, 1], self.table.shape[-1], axis=-1)
+            probabilities = np.empty_like(points)
+            # Every row using the same distribution is computed in a single call
+            for choice, pdf in ((0, norm.pdf), (1, maxwell.pdf)):
+                rows = choices == choice
+                probabilities[rows] = pdf(points[rows])
+            rows = np.flatnonzero(choices == 2)
+            if rows.size:
+                try:
+                    probabilities[rows] = evaluateExpression(self.customFunction.text(), points[rows],
+                                                             self.table.names[:-1], self.table.labels[:-1], rows)
+                except Exception as e:
+                    QtWidgets.QMessageBox.warning(self, "Custom function", str(e))
+                    return False
+            probabilities = self.normalize(probabilities)
+        # Update the cpt with the values, the model notifies the scene
+        self.scene.model.setCPT(self.nodeName, probabilities)
+        self.table.setArray(probabilities)
+        return True
 
     def closeWindow(self):
-        self.updateCPT()
-        self.close()
+        if self.updateCPT():
+            self.close()
 
     def applyCPT(self):
-        self.updateCPT()
-        self.plot()
-
-    def genGrid(self, firstRow, col, domains):
-        if col >= len(domains):
-            return
-        else:
-            numDomains = len(domains[col])
-            nRows = 1
-            for domain in domains[col:]:
-                nRows *= len(domain)
-            step = nRows / numDomains
-            for row in range(1, nRows + 1):
-                label = QtWidgets.QLabel()
-                label.setFont(self.font)
-                label.setAlignment(QtCore.Qt.AlignCenter)
-                index = (row - 1) / step
-                label.setText(str(domains[col][int(index)]))
-                self.grid.addWidget(label, firstRow + row, col, 1, 1)
-            for i in range(numDomains):
-                self.genGrid(firstRow + i * step, col + 1, domains)
-
-    # we truncate a pdf, so we need to normalize
-    def normalize(self, rv, vmin, vmax):
-        pdf = rv(linspace(vmin, vmax, self.nodeCPT.var_dims[-1]))
-        return pdf / sum(pdf)
-
-    def getUserFunction(self, index):
-        var('x')
-        while True:
-            func, ok = QtWidgets.QInputDialog.getText(QtWidgets.QWidget(), 'Input Dialog',
-                                                      'Enter function of row n° ' + str(
-                                                          index) + ':')  # use dialog to get node value to be added
-            if "x" in func:
-                break
-            else:
-                print("All'interno della funzione ci dev'essere la variabile x, riprova")
+        if self.updateCPT():
+            self.plot()
 
-        func = lambdify(x, sympify(func))
-        print("Test funzione:")
-        print("La tua funzione con input 2 da come risultato: {}\n\n".format(func(2)))
-        return func
+    # we truncate a pdf, so we need to normalize every row
+    def normalize(self, pdf):
+        return pdf / pdf.sum(axis=-1, keepdims=True)
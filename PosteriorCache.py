@@ -0,0 +1,72 @@
+import collections
+
+''' Posterior Cache
+
+    Description:
+        This file contains the cache of the results of the inference queries of BayesianModel, so a query asked
+        again for the same state of the model, or an inference window opened again, is answered without running an
+        engine. A result is kept under the version of the network, the evidence, the engine and the query variable
+        it was computed for; BayesianModel increments the version and clears the cache when the structure or a
+        CPT changes, so an outdated posterior is never returned. The least recently used results are dropped
+        beyond a number of results or a size of their posteriors, both configurable. The hits and the misses are
+        counted from the creation of the cache.
+
+'''
+
+POSTERIOR_CACHE_BYTES = 64 * 2 ** 20  # posteriors kept by default
+POSTERIOR_CACHE_ENTRIES = 1000  # results kept by default
+
+
+def resultArrays(reply):
+    # posterior arrays of a reply of the inference process
+    if reply[0] == 'posteriors':
+        return [reply[1].values]
+    return [reply[2]]
+
+
+class PosteriorCache:
+    def __init__(self, maxBytes=POSTERIOR_CACHE_BYTES, maxEntries=POSTERIOR_CACHE_ENTRIES):
+        self.maxBytes = maxBytes
+        self.maxEntries = maxEntries
+        self.entries = collections.OrderedDict()  # key -> (reply, bytes), the least recently used first
+        self.size = 0  # bytes of the posteriors kept
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        # reply kept for the key, None if there is none
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    def put(self, key, reply):
+        arrays = resultArrays(reply)
+        for values in arrays:  # Shared by every hit, a caller cannot change them in place
+            values.flags.writeable = False
+        size = sum(values.nbytes for values in arrays)
+        if key in self.entries:
+            self.size -= self.entries.pop(key)[1]
+        if size > self.maxBytes:  # It would drop every other result and still not fit
+            return
+        self.entries[key] = (reply, size)
+        self.size += size
+        self.shrink()
+
+    def setLimits(self, maxBytes=None, maxEntries=None):
+        if maxBytes is not None:
+            self.maxBytes = maxBytes
+        if maxEntries is not None:
+            self.maxEntries = maxEntries
+        self.shrink()
+
+    def shrink(self):
+        while self.entries and (self.size > self.maxBytes or len(self.entries) > self.maxEntries):
+            self.size -= self.entries.popitem(last=False)[1][1]
+
+    def clear(self):
+        self.entries.clear()
+        self.size = 0
@@ -0,0 +1,137 @@
+import json
+import os
+
+import numpy as np
+import pyAgrum as gum
+
+''' Project File
+
+    Description:
+        This file contains the reading and the writing of the binary project files (.bnp) that hold a whole network
+        in a single file: its structure, its variables, the positions of its nodes and its CPTs. The file starts
+        with a JSON header describing the variables, followed by the CPTs stored one after the other as little-endian
+        float64 arrays aligned on 64 bytes, with their axes in the order of toarray (the child last). The CPTs
+        are not parsed when the file is read: they are memory-mapped and copied into the network by BayesianModel
+        when a CPT is used for the first time. Labelized and range variables are stored as such, other discrete
+        variables as labelized variables with the same labels.
+
+'''
+
+PROJECT_EXTENSION = ".bnp"
+MAGIC = b"BNPROJ\x00\x01"  # first bytes of a project file, the last one is the version of the format
+ALIGNMENT = 64  # the header and every CPT start at a multiple of this number of bytes
+DTYPE = np.dtype('<f8')
+RANGE_TYPE = gum.RangeVariable('range', '', 0, 1).varType()  # the names of the VarType constants vary by version
+
+
+def isProject(path):
+    return path.lower().endswith(PROJECT_EXTENSION)
+
+
+def aligned(size):
+    return -(-size // ALIGNMENT) * ALIGNMENT
+
+
+def describeVariable(variable):
+    if variable.varType() == RANGE_TYPE:
+        return {"name": variable.name(), "description": variable.description(),
+                "range": [int(variable.label(0)), int(variable.label(variable.domainSize() - 1))]}
+    return {"name": variable.name(), "description": variable.description(),
+            "labels": [variable.label(i) for i in range(variable.domainSize())]}
+
+
+def createVariable(description):
+    if "range" in description:
+        minimum, maximum = description["range"]
+        return gum.RangeVariable(description["name"], description["description"], minimum, maximum)
+    variable = gum.LabelizedVariable(description["name"], description["description"], 0)
+    for label in description["labels"]:
+        variable.addLabel(label)
+    return variable
+
+
+def describeNetwork(bn, positions):
+    # description of every variable of the network as written in the header: labels, parents and position
+    variables = []
+    for node in bn.nodes():
+        name = bn.variable(node).name()
+        cpt = bn.cpt(name)
+        axes = [cpt.variable(i) for i in reversed(range(cpt.nbrDim()))]  # Order of toarray, the child last
+        description = describeVariable(bn.variable(node))
+        description["parents"] = [axis.name() for axis in axes[-2::-1]]  # Order of insertion, restores the axes
+        description["position"] = list(positions[name]) if name in positions else None
+        description["shape"] = [axis.domainSize() for axis in axes]
+        variables.append(description)
+    return variables
+
+
+def writeProject(path, bn, positions, storedCPTs=None):
+    # write the network, the positions of its nodes and its CPTs; storedCPTs are the memory-mapped CPTs not yet
+    # copied into the network, they are written as they are
+    storedCPTs = storedCPTs or {}
+    variables = describeNetwork(bn, positions)
+    arrays = {description["name"]: storedCPTs[description["name"]] if description["name"] in storedCPTs
+              else bn.cpt(description["name"]).toarray() for description in variables}
+    writeProjectFile(path, variables, arrays)
+
+
+def writeProjectFile(path, variables, arrays):
+    # write the variables described by describeNetwork and their CPTs (node name -> array in the order of the
+    # axes). The file is written next to path, flushed to the disk and then renamed, so a failed write, or a crash
+    # during the write, leaves the previous file intact. Windows does not replace a file that is memory-mapped, the
+    # CPTs mapped from path must be copied and their arrays dropped before it is written again.
+    offset = 0
+    for description in variables:
+        description["offset"] = offset
+        offset += aligned(int(np.prod(description["shape"])) * DTYPE.itemsize)
+    header = json.dumps({"variables": variables}).encode("utf-8")
+    start = aligned(len(MAGIC) + 8 + len(header))
+    temporary = path + ".tmp"
+    with open(temporary, "wb") as file:
+        file.write(MAGIC)
+        file.write(np.array([len(header)], dtype='<u8').tobytes())
+        file.write(header)
+        for description in variables:
+            file.seek(start + description["offset"])
+            file.write(np.ascontiguousarray(arrays[description["name"]], dtype=DTYPE).tobytes())
+        file.truncate(start + offset)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temporary, path)
+
+
+def readProject(path):
+    # network, positions and memory-mapped CPTs (node name -> read-only array) of a project file; raise
+    # FileNotFoundError or ValueError. The CPTs of the network are left uniform until the mapped arrays are copied.
+    with open(path, "rb") as file:
+        if file.read(len(MAGIC)) != MAGIC:
+            raise ValueError("Not a project file")
+        size = int(np.frombuffer(file.read(8), dtype='<u8')[0])
+        try:
+            header = json.loads(file.read(size).decode("utf-8"))
+        except ValueError:
+            raise ValueError("The header of the project file is damaged")
+    start = aligned(len(MAGIC) + 8 + size)
+    try:
+        variables = header["variables"]
+        bn = gum.BayesNet('Bayesian Net')
+        for description in variables:
+            bn.add(createVariable(description))
+        for description in variables:
+            for parent in description["parents"]:
+                bn.addArc(parent, description["name"])
+        positions = {description["name"]: tuple(description["position"]) for description in variables
+                     if description["position"] is not None}
+    except (KeyError, TypeError, gum.GumException) as e:
+        raise ValueError("The header of the project file is not valid: " + str(e))
+    storedCPTs = {}
+    length = os.path.getsize(path) - start
+    if length > 0:
+        data = np.memmap(path, dtype=DTYPE, mode='r', offset=start, shape=(length // DTYPE.itemsize,))
+        for description in variables:
+            first = description["offset"] // DTYPE.itemsize
+            count = int(np.prod(description["shape"]))
+            if first + count > len(data):
+                raise ValueError("The CPT of " + description["name"] + " is missing from the project file")
+            storedCPTs[description["name"]] = data[first:first + count].reshape(description["shape"])
+    return bn, positions, storedCPTs
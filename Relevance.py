@@ -0,0 +1,72 @@
+import numpy as np
+import pyAgrum as gum
+
+''' Relevance
+
+    Description:
+        This file contains the pruning of the network before the posterior of a single node is computed. The
+        Bayes-ball algorithm (Shachter, 1998) finds the CPTs requisite for the posterior of the query given the
+        evidence: the barren nodes, which are neither ancestors of the query nor of the evidence, and the nodes
+        d-separated from the query by the evidence are left out. The pruned network keeps the requisite CPTs, and
+        the observed parents of their nodes as roots with a uniform CPT, which their evidence overrides. A soft
+        evidence behaves as an observed child of its node that is not in the network.
+
+'''
+
+
+def families(bn):
+    # (node name -> parents in CPT order, node name -> children) of a pyAgrum network
+    parents = {}
+    children = {}
+    for node in bn.nodes():
+        name = bn.variable(node).name()
+        parents[name] = list(bn.cpt(name).names[1:])  # The child is first, the parents in order of insertion
+        children.setdefault(name, [])
+        for parent in parents[name]:
+            children.setdefault(parent, []).append(name)
+    return parents, children
+
+
+def requisiteNodes(parents, children, target, evidence):
+    # (nodes whose CPT is requisite for the posterior of target, observed nodes kept as roots) as frozensets
+    hard = {name for name, value in evidence.items() if isinstance(value, (int, np.integer))}
+    top = set()  # the ball went up from the node to its parents: its CPT is requisite
+    bottom = set()  # the ball went down from the node to its children
+    schedule = [(target, True)]  # (node, the ball comes from one of its children)
+    while schedule:
+        name, fromChild = schedule.pop()
+        if name in hard:
+            # an observed node blocks the balls of its children and sends the balls of its parents back up
+            if not fromChild and name not in top:
+                top.add(name)
+                schedule += [(parent, True) for parent in parents[name]]
+            continue
+        if fromChild and name not in top:
+            top.add(name)
+            schedule += [(parent, True) for parent in parents[name]]
+        if name not in bottom:
+            bottom.add(name)
+            schedule += [(child, False) for child in children[name]]
+            if name in evidence:  # The observed child of a soft evidence sends the ball back up
+                schedule.append((name, True))
+    roots = {parent for name in top for parent in parents[name]} - top
+    if target not in top:  # An observed query, its posterior is its evidence
+        roots.add(target)
+    return frozenset(top), frozenset(roots)
+
+
+def pruneNetwork(bn, parents, requisite, roots):
+    # network of the requisite CPTs and of the observed roots; the variables and the CPTs are copied from bn
+    pruned = gum.BayesNet('Pruned network')
+    for node in bn.nodes():  # In the order of bn, the nodes of the pruned network get the same order every time
+        name = bn.variable(node).name()
+        if name in requisite or name in roots:
+            pruned.add(bn.variable(name))
+    for name in requisite:
+        for parent in parents[name]:  # Same insertion order, so the CPT keeps the layout of the original
+            pruned.addArc(parent, name)
+    for name in requisite:
+        pruned.cpt(name).fillWith(bn.cpt(name))
+    for name in roots:
+        pruned.cpt(name).fillWith(1 / bn.variable(name).domainSize())
+    return pruned
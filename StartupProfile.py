@@ -0,0 +1,56 @@
+import builtins
+import sys
+import time
+
+''' Startup Profile
+
+    Description:
+        This file measures the start of the application when GraphGuiApplication is launched with
+        --profile-startup. It must be imported before any other module of the application: it then times every
+        module loaded during the startup and, once the first frame of the main window has been drawn, prints the
+        time spent since the launch and the imports that took longer than a few milliseconds, nested as they were
+        loaded.
+
+'''
+
+START = time.perf_counter()  # reference time of the launch, the interpreter startup is not included
+ENABLED = '--profile-startup' in sys.argv
+THRESHOLD = 0.005  # imports faster than this are not printed
+
+imports = []  # [depth, module name, cumulative seconds] of the modules loaded since the launch, in loading order
+depth = 0  # nesting level of the import in progress
+originalImport = builtins.__import__
+
+
+def timedImport(name, globals=None, locals=None, fromlist=(), level=0):
+    global depth
+    if level:  # Relative imports are counted in the package that makes them
+        return originalImport(name, globals, locals, fromlist, level)
+    loaded = len(sys.modules)
+    entry = [depth, name if not fromlist else "{} ({})".format(name, ", ".join(fromlist)), 0.0]
+    imports.append(entry)
+    depth += 1
+    start = time.perf_counter()
+    try:
+        return originalImport(name, globals, locals, fromlist, level)
+    finally:
+        entry[2] = time.perf_counter() - start
+        depth -= 1
+        if len(sys.modules) == loaded:  # Already loaded, nothing was imported
+            imports.pop()  # The nested imports loaded nothing either, so the entry is the last one
+
+
+def report(stage):
+    # print the time since the launch and the import breakdown, then stop timing the imports
+    builtins.__import__ = originalImport
+    out = sys.stderr
+    out.write("{}: {:.3f} s after launch\n".format(stage, time.perf_counter() - START))
+    out.write("imports: {:.3f} s\n".format(sum(entry[2] for entry in imports if entry[0] == 0)))
+    for level, name, seconds in imports:
+        if seconds >= THRESHOLD:
+            out.write("{:8.1f} ms  {}{}\n".format(seconds * 1000, "  " * level, name))
+    out.flush()
+
+
+if ENABLED:
+    builtins.__import__ = timedImport